@@ -1,9 +0,0 @@
-# config.py
-DEFAULT_CONFIG = {
-    'page_size': 'A4',
-    'margin_top': '25mm',
-    'margin_right': '25mm',
-    'margin_bottom': '25mm',
-    'margin_left': '25mm',
-    'encoding': 'UTF-8'
-}
\ No newline at end of file
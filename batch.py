@@ -0,0 +1,155 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from converter import MarkdownConverter
+from pdf_cache import DEFAULT_MAX_BYTES
+
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+
+# One converter per worker process, so wkhtmltopdf is only looked up once per worker
+_worker_converter = None
+
+
+def _init_worker(cache_dir=None, cache_max_bytes=None, in_memory=False, image_dpi=None, image_cache_dir=None,
+                 trace_path=None, parser=None, highlight_style=None, profile=None, theme=None, theme_file=None,
+                 asset_dir=None):
+    """Create the converter used by this worker process."""
+    global _worker_converter
+    cache = None
+    if cache_dir:
+        from pdf_cache import PdfCache
+        cache = PdfCache(cache_dir, max_bytes=cache_max_bytes or DEFAULT_MAX_BYTES)
+    image_pipeline = None
+    if image_dpi:
+        from image_assets import ImageAssetPipeline
+        image_pipeline = ImageAssetPipeline(image_cache_dir, dpi=image_dpi)
+    highlighter = None
+    if highlight_style:
+        from highlight import CodeHighlighter
+        highlighter = CodeHighlighter(highlight_style)
+    _worker_converter = MarkdownConverter(cache=cache, in_memory=in_memory, image_pipeline=image_pipeline,
+                                          parser=parser, highlighter=highlighter, profile=profile,
+                                          theme=theme, theme_file=theme_file, asset_dir=asset_dir)
+    if trace_path:
+        from instrumentation import JsonLinesTraceSink
+        # Every worker appends whole lines to the same file
+        _worker_converter.add_observer(JsonLinesTraceSink(trace_path))
+
+
+def _convert_one(input_file, output_file):
+    """Convert a single file inside a worker process."""
+    start = time.perf_counter()
+    success = _worker_converter.convert(input_file, output_file)
+    return (input_file, success, _worker_converter.last_error,
+            _worker_converter.last_cache_hit, time.perf_counter() - start, _worker_converter.last_sizes)
+
+
+def find_markdown_files(src_dir):
+    """Walk a directory tree and return all markdown files in a stable order."""
+    found = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                found.append(os.path.join(root, name))
+    return found
+
+
+def output_path_for(input_file, src_dir, out_dir):
+    """Mirror the input file's location below src_dir into out_dir as a .pdf."""
+    relative = os.path.relpath(input_file, src_dir)
+    return os.path.join(out_dir, os.path.splitext(relative)[0] + ".pdf")
+
+
+class BatchResult:
+    def __init__(self):
+        self.total = 0
+        self.converted = 0
+        self.failures = []
+        self.cache_hits = 0
+        self.elapsed = 0.0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.optimize_seconds = 0.0
+
+    @property
+    def files_per_second(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.converted / self.elapsed
+
+    def summary(self):
+        """Return a human readable throughput summary."""
+        lines = [
+            f"Converted {self.converted}/{self.total} files in {self.elapsed:.2f}s "
+            f"({self.files_per_second:.2f} files/s), {len(self.failures)} failed"
+        ]
+        if self.output_bytes:
+            lines.append(
+                f"Sizes: {self.input_bytes / 1e6:.2f} MB markdown -> {self.output_bytes / 1e6:.2f} MB PDF, "
+                f"{self.optimize_seconds:.2f}s optimizing"
+            )
+        if self.cache_hits:
+            lines.append(f"Cache: {self.cache_hits} hits, {self.converted - self.cache_hits} misses")
+        for input_file, error in self.failures:
+            lines.append(f"  FAILED {input_file}: {error}")
+        return "\n".join(lines)
+
+
+def run_batch(src_dir, out_dir, jobs=None, cache_dir=None, cache_max_bytes=None, in_memory=False,
+              image_dpi=None, image_cache_dir=None, trace_path=None, parser=None, highlight_style=None,
+              profile=None, theme=None, theme_file=None, asset_dir=None):
+    """Convert every markdown file below src_dir into out_dir using a process pool.
+
+    When cache_dir is given, unchanged inputs are served from the PDF cache.
+    With in_memory, HTML is piped to wkhtmltopdf instead of written to a temp file.
+    With image_dpi, local images are downscaled to that DPI before rendering.
+    With trace_path, every finished stage is written to that file as a JSON line.
+    parser selects the markdown parser backend (see parsers.py).
+    With highlight_style, fenced code blocks are syntax-highlighted in that Pygments style.
+    profile names an output size profile (see output_profiles.py).
+    theme, theme_file and asset_dir select the page theme (see config.py).
+    """
+    jobs = jobs or os.cpu_count() or 1
+    result = BatchResult()
+    files = find_markdown_files(src_dir)
+    result.total = len(files)
+
+    if trace_path:
+        # Start a fresh trace so the report only covers this run
+        open(trace_path, 'w').close()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(cache_dir, cache_max_bytes, in_memory, image_dpi, image_cache_dir,
+                                       trace_path, parser, highlight_style, profile, theme, theme_file,
+                                       asset_dir)) as pool:
+        futures = {
+            pool.submit(_convert_one, input_file, output_path_for(input_file, src_dir, out_dir)): input_file
+            for input_file in files
+        }
+        for future in as_completed(futures):
+            try:
+                input_file, success, error, cache_hit, duration, sizes = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed), not a normal conversion error
+                result.failures.append((futures[future], str(e)))
+                print(f"FAILED {futures[future]}: {e}")
+                continue
+
+            if success:
+                result.converted += 1
+                if cache_hit:
+                    result.cache_hits += 1
+                elif sizes:
+                    result.input_bytes += sizes['input_bytes']
+                    result.output_bytes += sizes['output_bytes']
+                    result.optimize_seconds += sizes['optimize_seconds']
+                print(f"OK     {input_file} ({duration:.2f}s{', cached' if cache_hit else ''})")
+            else:
+                result.failures.append((input_file, error or "conversion failed"))
+                print(f"FAILED {input_file}: {error}")
+
+    result.elapsed = time.perf_counter() - start
+    return result
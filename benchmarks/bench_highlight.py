@@ -0,0 +1,90 @@
+"""Benchmark syntax highlighting on code-heavy documents.
+
+Converts the code_heavy corpus from bench_pipeline three ways: without
+highlighting, with highlighting and an empty cache (cold), and again with the
+cache filled (warm). Warm runs should be no slower than conversions without
+highlighting; the exit status is 1 when they are slower than --threshold.
+
+Run from the repository root:
+    python benchmarks/bench_highlight.py
+    python benchmarks/bench_highlight.py --pdf-backend stub
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import StubPdfConverter, generate_corpus
+from converter import MarkdownConverter
+from highlight import CodeHighlighter
+
+
+def time_corpus(converter, paths, out_dir, repeat):
+    """Median conversion time per document in seconds."""
+    times = []
+    for _ in range(repeat):
+        for path in paths:
+            output_file = os.path.join(out_dir, os.path.basename(path) + ".pdf")
+            start = time.perf_counter()
+            if not converter.convert(path, output_file):
+                raise RuntimeError(f"Conversion failed: {converter.last_error}")
+            times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fenced code highlighting and its cache")
+    parser.add_argument("--scale", type=float, default=0.5, help="Multiply the corpus size by this factor")
+    parser.add_argument("--repeat", type=int, default=3, help="Conversions of each document per run")
+    parser.add_argument("--style", default="default", help="Pygments style to benchmark")
+    parser.add_argument("--pdf-backend", choices=["wkhtmltopdf", "stub"], default="wkhtmltopdf",
+                        help="Use 'stub' to benchmark without wkhtmltopdf")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown of warm runs that counts as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    converter_class = StubPdfConverter if args.pdf_backend == 'stub' else MarkdownConverter
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = generate_corpus('code_heavy', os.path.join(work_dir, "src"), scale=args.scale)
+        out_dir = os.path.join(work_dir, "out")
+        cache_dir = os.path.join(work_dir, "highlight-cache")
+
+        # The converter logs every conversion to stdout, which is reserved for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            plain = converter_class(in_memory=args.pdf_backend == 'stub')
+            plain.convert(paths[0], os.path.join(out_dir, "warmup.pdf"))
+            baseline = time_corpus(plain, paths, out_dir, args.repeat)
+
+            highlighter = CodeHighlighter(args.style, cache_dir=cache_dir)
+            cold_converter = converter_class(in_memory=args.pdf_backend == 'stub', highlighter=highlighter)
+            start = time.perf_counter()
+            cold = time_corpus(cold_converter, paths, out_dir, 1)
+            cold_total = time.perf_counter() - start
+
+            # A new highlighter starts with an empty memory cache but a filled disk cache,
+            # like the next run of the CLI
+            warm_highlighter = CodeHighlighter(args.style, cache_dir=cache_dir)
+            warm_converter = converter_class(in_memory=args.pdf_backend == 'stub', highlighter=warm_highlighter)
+            warm = time_corpus(warm_converter, paths, out_dir, args.repeat)
+
+    print(f"{len(paths)} code-heavy documents, median per document ({args.pdf_backend}):")
+    print(f"  no highlighting     {baseline * 1000:9.1f} ms")
+    print(f"  highlighting, cold  {cold * 1000:9.1f} ms  ({cold_total:.2f}s total, "
+          f"{highlighter.misses} snippets lexed)")
+    print(f"  highlighting, warm  {warm * 1000:9.1f} ms  ({warm_highlighter.hits} cache hits, "
+          f"{warm_highlighter.misses} misses)")
+    change = (warm - baseline) / baseline if baseline else 0.0
+    print(f"  warm vs no highlighting: {change * 100:+.1f}%")
+    if change > args.threshold:
+        print("Warm highlighted runs are slower than the threshold allows.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
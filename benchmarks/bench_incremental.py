@@ -0,0 +1,73 @@
+"""Benchmark: incremental markdown to HTML re-render time against edit size.
+
+Run from the repository root:
+    python benchmarks/bench_incremental.py [--sections 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown2
+
+from converter import MARKDOWN_EXTRAS
+from incremental_html import IncrementalRenderer
+
+
+def make_document(sections):
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Section {i}\n")
+        parts.append(f"Paragraph {i} with **bold**, `code` and a [reference][ref{i % 50}].\n")
+        parts.append("- first item\n- second item\n- third item\n")
+        parts.append("| name | value |\n|------|-------|\n| a | 1 |\n| b | 2 |\n")
+        parts.append(f"```python\ndef section_{i}():\n    return {i}\n```\n")
+    for i in range(50):
+        parts.append(f"[ref{i}]: https://example.com/{i}")
+    return "\n".join(parts)
+
+
+def edit_document(document, edits, seed):
+    """Change `edits` randomly chosen paragraphs."""
+    lines = document.split("\n")
+    candidates = [i for i, line in enumerate(lines) if line.startswith("Paragraph ")]
+    for index in random.Random(seed).sample(candidates, min(edits, len(candidates))):
+        lines[index] += f" Edited {seed}."
+    return "\n".join(lines)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=2000)
+    args = parser.parse_args()
+
+    document = make_document(args.sections)
+    print(f"Document: {args.sections} sections, {len(document) / 1024:.0f} KB")
+
+    full = timed(lambda: markdown2.markdown(document, extras=MARKDOWN_EXTRAS))
+    print(f"Full markdown2 render: {full * 1000:.1f} ms")
+
+    renderer = IncrementalRenderer(MARKDOWN_EXTRAS, max_blocks=args.sections * 10)
+    cold = timed(renderer.render, document)
+    print(f"Incremental, cold cache: {cold * 1000:.1f} ms")
+
+    print()
+    print(f"{'edited blocks':>14} {'re-render ms':>13} {'speedup':>8}")
+    for seed, edits in enumerate([0, 1, 10, 100, 1000], start=1):
+        edited = edit_document(document, edits, seed)
+        renderer.render(document)
+        elapsed = timed(renderer.render, edited)
+        print(f"{edits:>14} {elapsed * 1000:>13.1f} {full / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
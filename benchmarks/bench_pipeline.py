@@ -0,0 +1,298 @@
+"""Reproducible benchmark suite for the conversion pipeline.
+
+Generates synthetic corpora (many small notes, one huge manual, table-heavy,
+code-heavy and image-heavy documents), runs them through MarkdownConverter and
+reports throughput, end-to-end latency percentiles, per-stage percentiles and
+peak memory as JSON. Each corpus runs in a fresh process so peak RSS is
+measured per corpus.
+
+Run from the repository root:
+    python benchmarks/bench_pipeline.py --save baseline.json
+    python benchmarks/bench_pipeline.py --compare baseline.json
+
+Use --pdf-backend stub to replace wkhtmltopdf with an in-process stub, so the
+markdown/HTML stages can be benchmarked on machines without wkhtmltopdf.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converter import MarkdownConverter
+from instrumentation import StageStatistics, peak_rss_bytes, percentile
+
+CORPORA = ['small_notes', 'huge_manual', 'table_heavy', 'code_heavy', 'image_heavy']
+
+# Metrics compared against a baseline: (path in the corpus result, higher is better)
+COMPARED_METRICS = [
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p90'), False),
+    (('throughput_docs_per_s',), True),
+    (('peak_rss_bytes',), False),
+]
+
+WORDS = ("pipeline render document section table value example config output input "
+         "markdown convert page style layout format build release note guide").split()
+
+STUB_PDF = b"%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\ntrailer << /Root 1 0 R >>\n%%EOF\n"
+
+
+class StubPdfConverter(MarkdownConverter):
+    """MarkdownConverter whose wkhtmltopdf stage is an in-process stub."""
+
+    def _discover_wkhtmltopdf(self):
+        return "stub"
+
+    def check_dependencies(self):
+        return True
+
+    def get_wkhtmltopdf_version(self):
+        return "stub"
+
+    def html_to_pdf_bytes(self, html):
+        return STUB_PDF
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _paragraph(rng, sentences=4):
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def _table(rng, rows, columns):
+    header = "| " + " | ".join(f"col{c}" for c in range(columns)) + " |"
+    rule = "|" + "|".join("---" for _ in range(columns)) + "|"
+    body = ["| " + " | ".join(rng.choice(WORDS) for _ in range(columns)) + " |" for _ in range(rows)]
+    return "\n".join([header, rule] + body)
+
+
+def _code(rng, lines):
+    body = [f"    value_{i} = compute('{rng.choice(WORDS)}', {rng.randint(0, 999)})" for i in range(lines)]
+    return "```python\ndef generated():\n" + "\n".join(body) + "\n    return value_0\n```"
+
+
+def _png(path, width, height, seed):
+    """Write an RGB gradient PNG using only the standard library."""
+    rows = []
+    for y in range(height):
+        shade = (y * 255 // max(1, height - 1) + seed) % 256
+        rows.append(b"\x00" + bytes((shade, (shade * 3) % 256, 255 - shade)) * width)
+    raw = zlib.compress(b"".join(rows), 6)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", raw))
+        f.write(chunk(b"IEND", b""))
+
+
+def generate_corpus(kind, out_dir, seed=0, scale=1.0):
+    """Write a deterministic synthetic corpus and return its markdown file paths."""
+    rng = random.Random(f"{kind}-{seed}")
+    os.makedirs(out_dir, exist_ok=True)
+    documents = {}
+
+    if kind == 'small_notes':
+        for i in range(max(1, int(200 * scale))):
+            documents[f"note_{i:04d}.md"] = f"# Note {i}\n\n{_paragraph(rng, 3)}\n\n- {_sentence(rng)}\n- {_sentence(rng)}\n"
+    elif kind == 'huge_manual':
+        parts = ["# Manual\n"]
+        for chapter in range(max(1, int(40 * scale))):
+            parts.append(f"## Chapter {chapter}\n")
+            for section in range(5):
+                parts.append(f"### Section {chapter}.{section}\n\n{_paragraph(rng, 5)}\n")
+        documents["manual.md"] = "\n".join(parts)
+    elif kind == 'table_heavy':
+        for i in range(max(1, int(20 * scale))):
+            tables = "\n\n".join(_table(rng, 30, 6) for _ in range(5))
+            documents[f"tables_{i:03d}.md"] = f"# Tables {i}\n\n{tables}\n"
+    elif kind == 'code_heavy':
+        for i in range(max(1, int(20 * scale))):
+            blocks = "\n\n".join(f"{_sentence(rng)}\n\n{_code(rng, 25)}" for _ in range(10))
+            documents[f"code_{i:03d}.md"] = f"# Code {i}\n\n{blocks}\n"
+    elif kind == 'image_heavy':
+        image_dir = os.path.join(out_dir, "images")
+        os.makedirs(image_dir, exist_ok=True)
+        images = []
+        for i in range(8):
+            name = f"screenshot_{i}.png"
+            _png(os.path.join(image_dir, name), 2400, 1500, seed + i)
+            images.append(name)
+        for i in range(max(1, int(20 * scale))):
+            refs = "\n\n".join(f"{_sentence(rng)}\n\n![shot](images/{rng.choice(images)})" for _ in range(6))
+            documents[f"images_{i:03d}.md"] = f"# Screens {i}\n\n{refs}\n"
+    else:
+        raise ValueError(f"Unknown corpus: {kind}")
+
+    paths = []
+    for name, text in sorted(documents.items()):
+        path = os.path.join(out_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def _make_converter(pdf_backend, image_dpi, work_dir):
+    image_pipeline = None
+    if image_dpi:
+        from image_assets import ImageAssetPipeline
+        image_pipeline = ImageAssetPipeline(os.path.join(work_dir, "image-cache"), dpi=image_dpi)
+    if pdf_backend == 'stub':
+        return StubPdfConverter(in_memory=True, image_pipeline=image_pipeline)
+    return MarkdownConverter(image_pipeline=image_pipeline)
+
+
+def run_corpus(kind, seed, scale, repeat, pdf_backend, image_dpi):
+    """Benchmark one corpus; meant to run in its own process."""
+    # The converter logs to stdout, which is reserved for the JSON results
+    with contextlib.redirect_stdout(sys.stderr), tempfile.TemporaryDirectory() as work_dir:
+        paths = generate_corpus(kind, os.path.join(work_dir, "src"), seed, scale)
+        out_dir = os.path.join(work_dir, "out")
+        converter = _make_converter(pdf_backend, image_dpi, work_dir)
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+
+        # Warm-up pass, so imports and first-call costs do not skew the numbers
+        converter.convert(paths[0], os.path.join(out_dir, "warmup.pdf"))
+
+        statistics = StageStatistics()
+        converter.add_observer(statistics)
+        latencies = []
+        failures = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for path in paths:
+                output_file = os.path.join(out_dir, os.path.basename(path) + ".pdf")
+                doc_start = time.perf_counter()
+                if not converter.convert(path, output_file):
+                    failures += 1
+                latencies.append(time.perf_counter() - doc_start)
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    stages = {}
+    for stage, values in statistics.wall_times.items():
+        values = sorted(values)
+        stages[stage] = {
+            'p50_ms': percentile(values, 0.5) * 1000,
+            'p90_ms': percentile(values, 0.9) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'total_s': sum(values),
+        }
+
+    return {
+        'documents': len(paths),
+        'conversions': len(latencies),
+        'failures': failures,
+        'input_bytes': total_bytes,
+        'elapsed_s': elapsed,
+        'throughput_docs_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'throughput_mb_per_s': total_bytes * repeat / elapsed / 1e6 if elapsed else 0.0,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p90': percentile(latencies, 0.9) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'max': latencies[-1] * 1000 if latencies else 0.0,
+        },
+        'stages': stages,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages for metrics worse than threshold."""
+    regressions = []
+    for kind, current in results['corpora'].items():
+        previous = baseline.get('corpora', {}).get(kind)
+        if previous is None:
+            continue
+        for path, higher_is_better in COMPARED_METRICS:
+            now, before = current, previous
+            for key in path:
+                now = now.get(key) if isinstance(now, dict) else None
+                before = before.get(key) if isinstance(before, dict) else None
+            if not now or not before:
+                continue
+            change = (now - before) / before
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(
+                    f"{kind}: {'.'.join(path)} {before:.2f} -> {now:.2f} ({change * 100:+.1f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the markdown to PDF pipeline")
+    parser.add_argument("--corpus", action="append", choices=CORPORA,
+                        help="Corpus to run (repeatable, default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply corpus sizes by this factor")
+    parser.add_argument("--repeat", type=int, default=3, help="Conversions of each document")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpora")
+    parser.add_argument("--pdf-backend", choices=["wkhtmltopdf", "stub"], default="wkhtmltopdf",
+                        help="Use 'stub' to benchmark without wkhtmltopdf")
+    parser.add_argument("--image-dpi", type=int, default=None,
+                        help="Enable the image downscaling stage at this DPI (requires Pillow)")
+    parser.add_argument("--save", help="Write the JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change that counts as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pdf_backend': args.pdf_backend,
+            'image_dpi': args.image_dpi,
+            'seed': args.seed,
+            'scale': args.scale,
+            'repeat': args.repeat,
+        },
+        'corpora': {},
+    }
+
+    for kind in args.corpus or CORPORA:
+        print(f"Running {kind}...", file=sys.stderr)
+        # A fresh process per corpus keeps peak RSS and caches independent
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results['corpora'][kind] = pool.submit(
+                run_corpus, kind, args.seed, args.scale, args.repeat, args.pdf_backend, args.image_dpi
+            ).result()
+
+    output = json.dumps(results, indent=2)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions against baseline:", file=sys.stderr)
+            for message in regressions:
+                print(f"  {message}", file=sys.stderr)
+            return 1
+        print("\nNo regressions against baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
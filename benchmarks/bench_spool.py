@@ -0,0 +1,122 @@
+"""Soak test and throughput benchmark for spool workers on one machine.
+
+Queues a generated corpus in a spool directory and converts it with several
+worker processes using an in-process stub instead of wkhtmltopdf. One worker
+is killed in the middle of a job, and one stalls without heartbeats so its
+lease is taken back while it is still converting. At the end every job must
+be in done/ exactly once, with its PDF published, and the surviving workers
+must exit cleanly; the exit status is 1 otherwise.
+
+Run from the repository root:
+    python benchmarks/bench_spool.py --workers 3 --docs 60
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import StubPdfConverter
+from spool import CLAIMED, DONE, FAILED, PENDING, SpoolQueue, SpoolWorker, job_id_for
+
+
+class SlowStubConverter(StubPdfConverter):
+    """Stub converter that takes a fixed time per document, like a real render."""
+
+    def __init__(self, delay):
+        super().__init__(in_memory=True)
+        self.delay = delay
+
+    def html_to_pdf_bytes(self, html):
+        time.sleep(self.delay)
+        return super().html_to_pdf_bytes(html)
+
+
+class StalledWorker(SpoolWorker):
+    """A worker that never refreshes its lease, as if its node froze mid-job."""
+
+    def _keep_lease(self, claim_path, finished):
+        finished.wait()
+
+
+def _run_worker(spool_dir, lease, delay, stalled, worker_id):
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        worker_class = StalledWorker if stalled else SpoolWorker
+        worker = worker_class(spool_dir, lease=lease, poll=0.05, converter=SlowStubConverter(delay),
+                              worker_id=worker_id)
+        worker.run(exit_when_idle=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check spool workers against crashes and lost leases")
+    parser.add_argument("--workers", type=int, default=3, help="Healthy worker processes (default: 3)")
+    parser.add_argument("--docs", type=int, default=60, help="Documents to convert (default: 60)")
+    parser.add_argument("--delay", type=float, default=0.05, help="Seconds per conversion (default: 0.05)")
+    parser.add_argument("--lease", type=float, default=1.0, help="Lease in seconds (default: 1)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        src_dir = os.path.join(work_dir, "src")
+        out_dir = os.path.join(work_dir, "out")
+        spool_dir = os.path.join(work_dir, "spool")
+        os.makedirs(src_dir)
+        os.makedirs(out_dir)
+        queue = SpoolQueue(spool_dir, lease=args.lease)
+        inputs = []
+        for index in range(args.docs):
+            path = os.path.join(src_dir, f"doc{index:04d}.md")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"# Document {index}\n\nSome text.\n")
+            queue.enqueue(path, os.path.join(out_dir, f"doc{index:04d}.pdf"))
+            inputs.append(path)
+
+        start = time.perf_counter()
+        # Slow enough that the crashed and stalled workers hold a claim when it matters
+        victim = multiprocessing.Process(target=_run_worker,
+                                         args=(spool_dir, args.lease, args.lease * 5, False, "victim"))
+        stalled = multiprocessing.Process(target=_run_worker,
+                                          args=(spool_dir, args.lease, args.lease * 2, True, "stalled"))
+        healthy = [multiprocessing.Process(target=_run_worker,
+                                           args=(spool_dir, args.lease, args.delay, False, f"worker-{i}"))
+                   for i in range(args.workers)]
+        for process in [victim, stalled] + healthy:
+            process.start()
+        time.sleep(args.lease / 2)
+        os.kill(victim.pid, signal.SIGKILL)
+        for process in [victim, stalled] + healthy:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        problems = []
+        counts = queue.counts()
+        if counts[PENDING] or counts[CLAIMED] or counts[FAILED]:
+            problems.append(f"spool not drained: {counts}")
+        done = {result['id']: result for result in queue.results(DONE)}
+        for path in inputs:
+            result = done.get(job_id_for(path))
+            if result is None:
+                problems.append(f"no done record for {path}")
+            elif not os.path.isfile(result['output']):
+                problems.append(f"PDF not published for {path}")
+        leftovers = [name for name in os.listdir(out_dir) if not name.endswith('.pdf') or '.tmp' in name]
+        if leftovers:
+            problems.append(f"temporary files left in the output directory: {leftovers}")
+        for process in [stalled] + healthy:
+            if process.exitcode != 0:
+                problems.append(f"{process.name} exited with {process.exitcode}")
+
+    retried = sum(1 for result in done.values() if result['attempts'])
+    print(f"{len(done)}/{args.docs} documents in {elapsed:.2f}s ({len(done) / elapsed:.1f} files/s) "
+          f"with {args.workers} healthy workers; {retried} retried after a lost lease")
+    for problem in problems:
+        print(f"  PROBLEM {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Compare markdown parser backends for output conformance and speed.
+
+Every document is rendered by each installed backend (see parsers.py) and the
+HTML is compared with markdown2's, the reference, after normalising
+whitespace. Reports per-document render times and similarity, plus a summary
+per backend.
+
+Run from the repository root:
+    python benchmarks/compare_parsers.py                 # synthetic corpora
+    python benchmarks/compare_parsers.py docs/ --json out.json
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import find_markdown_files
+from bench_pipeline import generate_corpus
+from parsers import available_backends, get_backend
+
+REFERENCE = 'markdown2'
+# The image corpus only differs from the others by its PNG files
+GENERATED_CORPORA = ['small_notes', 'huge_manual', 'table_heavy', 'code_heavy']
+
+
+def normalize_html(html):
+    """Reduce HTML to a form where only meaningful differences remain."""
+    html = re.sub(r'<(br|hr|img[^>]*?)\s*/?>', r'<\1>', html)
+    html = re.sub(r'>\s+<', '><', html)
+    return re.sub(r'\s+', ' ', html).strip()
+
+
+def time_render(backend, content, repeat):
+    """Best-of-repeat render time in seconds, plus the rendered HTML."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        html = backend.render(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, html
+
+
+def compare_documents(paths, backends, repeat):
+    results = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        timings = {}
+        rendered = {}
+        for backend in backends:
+            timings[backend.name], rendered[backend.name] = time_render(backend, content, repeat)
+
+        reference = normalize_html(rendered[REFERENCE])
+        document = {'path': path, 'bytes': len(content.encode('utf-8')), 'backends': {}}
+        for backend in backends:
+            html = normalize_html(rendered[backend.name])
+            document['backends'][backend.name] = {
+                'time_ms': timings[backend.name] * 1000,
+                'exact': html == reference,
+                'similarity': difflib.SequenceMatcher(None, reference, html, autojunk=False).ratio(),
+            }
+        results.append(document)
+    return results
+
+
+def summarize(results, names):
+    summary = {}
+    reference_median = statistics.median(doc['backends'][REFERENCE]['time_ms'] for doc in results)
+    for name in names:
+        entries = [doc['backends'][name] for doc in results]
+        median = statistics.median(entry['time_ms'] for entry in entries)
+        summary[name] = {
+            'median_ms': median,
+            'speedup': reference_median / median if median else 0.0,
+            'exact_matches': sum(entry['exact'] for entry in entries),
+            'documents': len(entries),
+            'mean_similarity': statistics.mean(entry['similarity'] for entry in entries),
+        }
+    return summary
+
+
+def print_report(results, summary, names):
+    header = f"{'document':<40}" + "".join(f" {name:>20}" for name in names)
+    print(header)
+    print("-" * len(header))
+    for doc in results:
+        cells = []
+        for name in names:
+            entry = doc['backends'][name]
+            mark = '=' if entry['exact'] else f"{entry['similarity'] * 100:.0f}%"
+            cells.append(f" {entry['time_ms']:>12.2f}ms {mark:>5}")
+        print(f"{os.path.basename(doc['path'])[:40]:<40}" + "".join(cells))
+
+    print()
+    print(f"{'backend':<14} {'median ms':>10} {'speedup':>8} {'exact':>8} {'similarity':>11}")
+    for name in names:
+        entry = summary[name]
+        print(f"{name:<14} {entry['median_ms']:>10.2f} {entry['speedup']:>7.2f}x "
+              f"{entry['exact_matches']:>3}/{entry['documents']:<4} {entry['mean_similarity'] * 100:>10.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare markdown parser backends against markdown2")
+    parser.add_argument("src_dir", nargs="?", default=None,
+                        help="Directory of markdown files (default: generated benchmark corpora)")
+    parser.add_argument("--backend", action="append", default=None,
+                        help="Backend to include (repeatable, default: all installed)")
+    parser.add_argument("--repeat", type=int, default=5, help="Renders per document; the best time is kept")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated corpora")
+    parser.add_argument("--json", default=None, help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    names = args.backend or available_backends()
+    if REFERENCE not in names:
+        names.insert(0, REFERENCE)
+    try:
+        backends = [get_backend(name) for name in names]
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.src_dir:
+            paths = find_markdown_files(args.src_dir)
+        else:
+            paths = []
+            for kind in GENERATED_CORPORA:
+                corpus = generate_corpus(kind, os.path.join(work_dir, kind), seed=args.seed, scale=0.1)
+                paths.extend(corpus)
+        if not paths:
+            print("Error: no markdown files found", file=sys.stderr)
+            return 2
+        results = compare_documents(paths, backends, args.repeat)
+
+    summary = summarize(results, names)
+    print_report(results, summary, names)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'reference': REFERENCE, 'documents': results, 'summary': summary}, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Book mode: render an ordered set of chapters with one wkhtmltopdf process.
+
+Each chapter is rendered to its own HTML page once, and all pages are passed
+to a single wkhtmltopdf invocation, so process startup and font loading are
+paid once per book instead of once per chapter. wkhtmltopdf starts every page
+on a new sheet and can generate a table of contents and a PDF outline from the
+chapter headings.
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from batch import find_markdown_files
+from converter import MarkdownConverter
+from fileutil import atomic_path
+
+DEFAULT_OUTLINE_DEPTH = 3
+
+
+def read_manifest(manifest):
+    """Return the ordered chapter files listed in a manifest.
+
+    The manifest is a text file with one markdown path per line, relative to
+    the manifest's directory; blank lines and lines starting with # are
+    ignored. A directory is also accepted and yields its markdown files in
+    sorted order.
+    """
+    if os.path.isdir(manifest):
+        return find_markdown_files(manifest)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest))
+    chapters = []
+    with open(manifest, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            chapters.append(os.path.normpath(os.path.join(base_dir, line)))
+
+    missing = [path for path in chapters if not os.path.isfile(path)]
+    if missing:
+        raise ValueError(f"Chapters listed in {manifest} do not exist: {', '.join(missing)}")
+    return chapters
+
+
+def build_book(manifest, output_file, toc=False, outline=True, outline_depth=DEFAULT_OUTLINE_DEPTH,
+               title=None, converter=None):
+    """Convert every chapter in manifest into one PDF with a single wkhtmltopdf run."""
+    import pdfkit
+
+    converter = converter or MarkdownConverter()
+    converter.check_dependencies()
+    chapters = read_manifest(manifest)
+    if not chapters:
+        raise ValueError(f"No chapters found in {manifest}")
+    title = title or Path(manifest).stem
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pages = []
+        for index, chapter in enumerate(chapters):
+            if converter.cancelled:
+                return False
+            progress = int(80 * index / len(chapters))
+            with converter.stage("markdown", chapter, f"Rendering {os.path.basename(chapter)}...", progress,
+                                 bytes_in=os.path.getsize(chapter)) as event:
+                html = converter.markdown_to_html(converter.read_file(chapter))
+                html = converter.highlight_code(converter.process_images(html, chapter))
+                html = converter.wrap_html(html, Path(chapter).stem)
+                event.bytes_out = len(html)
+            # Short names keep the wkhtmltopdf command line small for large books
+            page = os.path.join(temp_dir, f"{index:05d}.html")
+            with open(page, 'w', encoding='utf-8') as f:
+                f.write(html)
+            pages.append(page)
+
+        kwargs = converter.pdfkit_kwargs()
+        kwargs['options']['title'] = title
+        if outline:
+            kwargs['options']['outline'] = ''
+            kwargs['options']['outline-depth'] = str(outline_depth)
+        else:
+            kwargs['options']['no-outline'] = ''
+        if toc:
+            # pdfkit only emits the toc page when its options are non-empty
+            kwargs['toc'] = {'toc-header-text': 'Contents'}
+
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        os.makedirs(output_dir, exist_ok=True)
+        with converter.stage("wkhtmltopdf", output_file, f"Converting {len(pages)} chapters to PDF...", 80,
+                             bytes_in=sum(os.path.getsize(page) for page in pages)) as event:
+            with atomic_path(output_file) as temp_pdf:
+                pdfkit.from_file(pages, temp_pdf, **kwargs)
+                if not os.path.exists(temp_pdf) or os.path.getsize(temp_pdf) == 0:
+                    raise RuntimeError("PDF file was not created successfully")
+                event.bytes_out = os.path.getsize(temp_pdf)
+
+    elapsed = time.perf_counter() - start
+    converter.report("Conversion completed successfully!", 100)
+    print(f"Converted {len(chapters)} chapters from {manifest} to {output_file} in {elapsed:.2f}s")
+    return True
@@ -0,0 +1,237 @@
+"""Incremental directory rebuilds driven by a SQLite build database.
+
+For every output PDF the database records the files it was built from (the
+markdown source and the local images it references) with their size, mtime
+and content hash, plus a fingerprint of the converter settings (template,
+CSS, wkhtmltopdf options and version, parser, image DPI). A rebuild only
+re-renders outputs whose dependencies or settings changed, and deletes
+outputs whose source file is gone.
+
+Unchanged files are recognised by (size, mtime) alone; a file is only hashed
+when its stat changed, so a touched but unmodified file is not re-rendered.
+"""
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import batch
+from batch import find_markdown_files, output_path_for
+from converter import MarkdownConverter
+from fileutil import file_digest
+
+DATABASE_NAME = ".md_to_pdf-build.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    output TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    built_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    output TEXT NOT NULL REFERENCES outputs(output) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (output, path)
+);
+"""
+
+
+def _dependency(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, file_digest(path))
+
+
+def settings_fingerprint(converter):
+    """Hash of every converter setting that changes the rendered PDF, whatever the input."""
+    # The cache key with empty content covers the settings, including the image pipeline's
+    return converter.get_cache_key("", "")
+
+
+class BuildDatabase:
+    """Outputs, their dependencies and the settings they were built with."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def load(self):
+        """Return {output: (source, settings, [(path, size, mtime_ns, digest), ...])}."""
+        records = {}
+        for output, source, settings in self._db.execute("SELECT output, source, settings FROM outputs"):
+            records[output] = (source, settings, [])
+        for output, path, size, mtime_ns, digest in self._db.execute(
+                "SELECT output, path, size, mtime_ns, digest FROM dependencies"):
+            if output in records:
+                records[output][2].append((path, size, mtime_ns, digest))
+        return records
+
+    def record(self, output, source, settings, dependencies):
+        with self._db:
+            self._db.execute("DELETE FROM outputs WHERE output = ?", (output,))
+            self._db.execute("INSERT INTO outputs VALUES (?, ?, ?, ?)", (output, source, settings, time.time()))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO dependencies VALUES (?, ?, ?, ?, ?)",
+                [(output, path, size, mtime_ns, digest) for path, size, mtime_ns, digest in dependencies]
+            )
+
+    def refresh_stat(self, output, path, size, mtime_ns):
+        """Remember a new stat for a dependency whose content hash did not change."""
+        with self._db:
+            self._db.execute("UPDATE dependencies SET size = ?, mtime_ns = ? WHERE output = ? AND path = ?",
+                             (size, mtime_ns, output, path))
+
+    def forget(self, output):
+        with self._db:
+            self._db.execute("DELETE FROM outputs WHERE output = ?", (output,))
+
+    def close(self):
+        self._db.close()
+
+
+def _is_stale(db, output, record, settings):
+    """Return True if output has to be rebuilt; refreshes stats of touched but unchanged files."""
+    if record is None or record[1] != settings or not os.path.exists(output):
+        return True
+    for path, size, mtime_ns, digest in record[2]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+            continue
+        if stat.st_size != size or file_digest(path) != digest:
+            return True
+        db.refresh_stat(output, path, stat.st_size, stat.st_mtime_ns)
+    return False
+
+
+def _build_one(input_file, output_file):
+    """Convert one file in a batch worker and return its dependencies."""
+    start = time.perf_counter()
+    converter = batch._worker_converter
+    # Stat and hash the source before reading it, so an edit during the render is seen next time
+    source = _dependency(input_file)
+    success = converter.convert(input_file, output_file)
+    dependencies = [source]
+    if success:
+        for path in converter.last_inputs[1:]:
+            try:
+                dependencies.append(_dependency(path))
+            except OSError:
+                pass
+    return input_file, success, converter.last_error, dependencies, time.perf_counter() - start
+
+
+def _remove_output(output, out_dir):
+    try:
+        os.remove(output)
+    except FileNotFoundError:
+        pass
+    # Drop directories left empty, but never out_dir itself
+    directory = os.path.dirname(output)
+    out_dir = os.path.abspath(out_dir)
+    while directory != out_dir and directory.startswith(out_dir + os.sep):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+class RebuildResult:
+    def __init__(self):
+        self.total = 0
+        self.rebuilt = 0
+        self.up_to_date = 0
+        self.removed = 0
+        self.failures = []
+        self.elapsed = 0.0
+
+    def summary(self):
+        """Return a human readable summary."""
+        lines = [
+            f"Checked {self.total} files in {self.elapsed:.2f}s: {self.rebuilt} rebuilt, "
+            f"{self.up_to_date} up to date, {self.removed} removed, {len(self.failures)} failed"
+        ]
+        for input_file, error in self.failures:
+            lines.append(f"  FAILED {input_file}: {error}")
+        return "\n".join(lines)
+
+
+def run_rebuild(src_dir, out_dir, jobs=None, parser=None, image_dpi=None, image_cache_dir=None,
+                dry_run=False, profile=None):
+    """Bring out_dir up to date with src_dir, converting only what changed.
+
+    The build database lives at out_dir/.md_to_pdf-build.sqlite. With dry_run,
+    only report what would be rebuilt or removed.
+    """
+    start = time.perf_counter()
+    result = RebuildResult()
+    image_pipeline = None
+    if image_dpi:
+        from image_assets import ImageAssetPipeline
+        image_pipeline = ImageAssetPipeline(image_cache_dir, dpi=image_dpi)
+    converter = MarkdownConverter(parser=parser, image_pipeline=image_pipeline, profile=profile)
+    settings = settings_fingerprint(converter)
+
+    db = BuildDatabase(os.path.join(out_dir, DATABASE_NAME))
+    try:
+        records = db.load()
+        stale = []
+        current_outputs = set()
+        for input_file in find_markdown_files(src_dir):
+            result.total += 1
+            output_file = os.path.abspath(output_path_for(input_file, src_dir, out_dir))
+            current_outputs.add(output_file)
+            if _is_stale(db, output_file, records.get(output_file), settings):
+                stale.append((input_file, output_file))
+            else:
+                result.up_to_date += 1
+
+        for output_file in sorted(set(records) - current_outputs):
+            print(f"{'WOULD REMOVE' if dry_run else 'REMOVED'} {output_file}")
+            if not dry_run:
+                _remove_output(output_file, out_dir)
+                db.forget(output_file)
+            result.removed += 1
+
+        if dry_run:
+            for input_file, _ in stale:
+                print(f"WOULD BUILD {input_file}")
+            result.rebuilt = len(stale)
+        elif stale:
+            jobs = min(jobs or os.cpu_count() or 1, len(stale))
+            with ProcessPoolExecutor(max_workers=jobs, initializer=batch._init_worker,
+                                     initargs=(None, None, False, image_dpi, image_cache_dir, None,
+                                               parser, None, profile)) as pool:
+                futures = {pool.submit(_build_one, input_file, output_file): (input_file, output_file)
+                           for input_file, output_file in stale}
+                for future in as_completed(futures):
+                    input_file, output_file = futures[future]
+                    try:
+                        _, success, error, dependencies, duration = future.result()
+                    except Exception as e:
+                        success, error, duration = False, str(e), 0.0
+                    if success:
+                        db.record(output_file, os.path.abspath(input_file), settings, dependencies)
+                        result.rebuilt += 1
+                        print(f"BUILT  {input_file} ({duration:.2f}s)")
+                    else:
+                        # Forget it so the next rebuild retries even if nothing changes
+                        db.forget(output_file)
+                        result.failures.append((input_file, error or "conversion failed"))
+                        print(f"FAILED {input_file}: {error}")
+    finally:
+        db.close()
+
+    result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,269 @@
+"""Themes: page CSS, page size, margins, header and footer.
+
+Themes are read from a JSON file, validated and compiled once per process into
+a CompiledTheme: the HTML shell with the stylesheet already in place and the
+wkhtmltopdf options for the page. Converting a document then only joins
+strings. Example theme file:
+
+    {
+        "themes": {
+            "report": {
+                "extends": "default",
+                "css_files": ["report.css"],
+                "fonts": {"Inter": "fonts/Inter-Regular.ttf"},
+                "page_size": "Letter",
+                "margin_top": "30mm",
+                "footer": {"center": "Page [page] of [topage]", "font_size": 8}
+            }
+        }
+    }
+
+Paths are relative to the theme file. Keys a theme leaves out come from the
+theme it extends, or from DEFAULT_CONFIG. With an asset directory, the
+stylesheet and fonts are written there once and linked from every document
+instead of being inlined into each one.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+from fileutil import write_atomic
+
+DEFAULT_CONFIG = {
+    'page_size': 'A4',
+    'margin_top': '25mm',
+    'margin_right': '25mm',
+    'margin_bottom': '25mm',
+    'margin_left': '25mm',
+    'encoding': 'UTF-8'
+}
+
+DEFAULT_THEME = 'default'
+
+PAGE_CSS = """
+                    body { font-family: Arial, sans-serif; line-height: 1.6; margin: 2em; }
+                    h1, h2, h3 { color: #333; }
+                    code { background-color: #f4f4f4; border-radius: 3px; padding: 2px 5px; }
+                    pre { background-color: #f4f4f4; border-radius: 5px; padding: 10px; overflow-x: auto; }
+                    blockquote { border-left: 5px solid #ddd; padding-left: 15px; color: #555; }
+                    img { max-width: 100%; }
+                    table { border-collapse: collapse; width: 100%; }
+                    th, td { border: 1px solid #ddd; padding: 8px; }
+"""
+
+# The built-in theme keeps the converter's original 20mm margins
+BUILTIN_THEMES = {
+    'default': {
+        'css': PAGE_CSS,
+        'margin_top': '20mm',
+        'margin_right': '20mm',
+        'margin_bottom': '20mm',
+        'margin_left': '20mm',
+    },
+}
+
+PAGE_SIZES = {'A3', 'A4', 'A5', 'B4', 'B5', 'Letter', 'Legal', 'Tabloid', 'Executive'}
+ORIENTATIONS = {'Portrait', 'Landscape'}
+MARGIN_RE = re.compile(r'^\d+(\.\d+)?(mm|cm|in|px)?$')
+THEME_KEYS = {'extends', 'css', 'css_files', 'fonts', 'page_size', 'orientation', 'margin_top', 'margin_right',
+              'margin_bottom', 'margin_left', 'encoding', 'header', 'footer'}
+# Header and footer keys and the wkhtmltopdf option suffix they map to
+HEADER_KEYS = {'left': 'left', 'center': 'center', 'right': 'right', 'font_size': 'font-size',
+               'spacing': 'spacing', 'line': 'line'}
+
+
+def load_theme_file(path):
+    """Return the {name: theme} mapping defined in a JSON theme file."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Theme file {path} is not valid JSON: {str(e)}")
+    themes = data.get('themes') if isinstance(data, dict) else None
+    if not isinstance(themes, dict):
+        raise ValueError(f"Theme file {path} must contain a \"themes\" object")
+    return themes
+
+
+def _validate_band(name, key, band):
+    if not isinstance(band, dict):
+        raise ValueError(f"Theme '{name}': {key} must be an object")
+    unknown = set(band) - set(HEADER_KEYS)
+    if unknown:
+        raise ValueError(f"Theme '{name}': unknown {key} keys: {', '.join(sorted(unknown))}")
+    if 'font_size' in band and not isinstance(band['font_size'], int):
+        raise ValueError(f"Theme '{name}': {key}.font_size must be an integer")
+    if 'spacing' in band and not isinstance(band['spacing'], (int, float)):
+        raise ValueError(f"Theme '{name}': {key}.spacing must be a number")
+
+
+def validate_theme(name, theme, base_dir=None):
+    """Raise ValueError if a theme definition has unknown keys, bad values or missing files."""
+    if not isinstance(theme, dict):
+        raise ValueError(f"Theme '{name}' must be an object")
+    unknown = set(theme) - THEME_KEYS
+    if unknown:
+        raise ValueError(f"Theme '{name}': unknown keys: {', '.join(sorted(unknown))}")
+    if not isinstance(theme.get('css', ''), str):
+        raise ValueError(f"Theme '{name}': css must be a string")
+    if not isinstance(theme.get('css_files', []), list):
+        raise ValueError(f"Theme '{name}': css_files must be a list of files")
+    if 'page_size' in theme and theme['page_size'] not in PAGE_SIZES:
+        raise ValueError(f"Theme '{name}': page_size must be one of {', '.join(sorted(PAGE_SIZES))}")
+    if 'orientation' in theme and theme['orientation'] not in ORIENTATIONS:
+        raise ValueError(f"Theme '{name}': orientation must be Portrait or Landscape")
+    for key in ('margin_top', 'margin_right', 'margin_bottom', 'margin_left'):
+        if key in theme and not MARGIN_RE.match(str(theme[key])):
+            raise ValueError(f"Theme '{name}': {key} must be a length such as 20mm, got {theme[key]!r}")
+    for key in ('header', 'footer'):
+        if key in theme:
+            _validate_band(name, key, theme[key])
+    files = list(theme.get('css_files', []))
+    fonts = theme.get('fonts', {})
+    if not isinstance(fonts, dict):
+        raise ValueError(f"Theme '{name}': fonts must map font family names to files")
+    files.extend(fonts.values())
+    for path in files:
+        full_path = os.path.join(base_dir or '', path)
+        if not os.path.isfile(full_path):
+            raise ValueError(f"Theme '{name}': file does not exist: {full_path}")
+
+
+def resolve_theme(name, themes, base_dir=None):
+    """Merge a theme with the themes it extends into one flat definition."""
+    seen = []
+    chain = []
+    while name is not None:
+        if name in seen:
+            raise ValueError(f"Theme '{name}' extends itself: {' -> '.join(seen + [name])}")
+        seen.append(name)
+        if name in themes:
+            theme, theme_dir = themes[name], base_dir
+        elif name in BUILTIN_THEMES:
+            theme, theme_dir = BUILTIN_THEMES[name], None
+        else:
+            available = sorted(set(themes) | set(BUILTIN_THEMES))
+            raise ValueError(f"Unknown theme '{name}'. Choose one of: {', '.join(available)}")
+        validate_theme(name, theme, theme_dir)
+        chain.append((theme, theme_dir))
+        name = theme.get('extends')
+
+    resolved = dict(DEFAULT_CONFIG, css='', css_files=[], fonts={}, header={}, footer={})
+    for theme, theme_dir in reversed(chain):
+        for key, value in theme.items():
+            if key == 'css':
+                resolved['css'] += value
+            elif key == 'css_files':
+                resolved['css_files'] += [os.path.join(theme_dir or '', path) for path in value]
+            elif key == 'fonts':
+                resolved['fonts'].update({family: os.path.join(theme_dir or '', path)
+                                          for family, path in value.items()})
+            elif key != 'extends':
+                resolved[key] = value
+    return resolved
+
+
+def _write_asset(path, data):
+    """Write an asset unless a previous run already did; names are content hashes."""
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, data)
+
+
+class CompiledTheme:
+    """A theme ready to wrap HTML fragments: fixed page shell and wkhtmltopdf options."""
+
+    def __init__(self, name, resolved, asset_dir=None):
+        self.name = name
+        self.asset_dir = asset_dir
+        self.local_assets = bool(asset_dir or resolved['fonts'])
+
+        font_rules = []
+        for family, path in sorted(resolved['fonts'].items()):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if asset_dir:
+                digest = hashlib.sha256(data).hexdigest()[:16]
+                path = os.path.join(asset_dir, 'fonts', f"{digest}-{os.path.basename(path)}")
+                _write_asset(path, data)
+            font_rules.append(f"@font-face {{ font-family: '{family}'; src: url('{Path(path).resolve().as_uri()}'); }}")
+        css_parts = font_rules + [resolved['css']]
+        for path in resolved['css_files']:
+            with open(path, 'r', encoding='utf-8') as f:
+                css_parts.append(f.read())
+        self.css = "\n".join(css_parts)
+
+        if asset_dir:
+            digest = hashlib.sha256(self.css.encode('utf-8')).hexdigest()[:16]
+            stylesheet = os.path.join(asset_dir, f"{name}-{digest}.css")
+            _write_asset(stylesheet, self.css.encode('utf-8'))
+            style = f'<link rel="stylesheet" href="{Path(stylesheet).resolve().as_uri()}">'
+        else:
+            style = f"<style>{self.css}</style>"
+        self._head = '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>'
+        self._after_title = f"</title>\n{style}\n"
+        self._body = "</head>\n<body>\n"
+        self._tail = "\n</body>\n</html>\n"
+
+        options = {
+            'quiet': '',
+            'page-size': resolved['page_size'],
+            'margin-top': resolved['margin_top'],
+            'margin-right': resolved['margin_right'],
+            'margin-bottom': resolved['margin_bottom'],
+            'margin-left': resolved['margin_left'],
+            'encoding': resolved['encoding'],
+        }
+        if 'orientation' in resolved:
+            options['orientation'] = resolved['orientation']
+        for band in ('header', 'footer'):
+            for key, value in resolved[band].items():
+                option = f"{band}-{HEADER_KEYS[key]}"
+                if key == 'line':
+                    if value:
+                        options[option] = ''
+                else:
+                    options[option] = str(value)
+        if self.local_assets:
+            # Linked stylesheets and fonts are file:// URIs, which newer wkhtmltopdf blocks by default
+            options['enable-local-file-access'] = ''
+        self.options = options
+
+        self.fingerprint = hashlib.sha256(
+            json.dumps([self._head, self._after_title, self.css, options], sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    def render(self, title, body, extra_css=""):
+        """Wrap an HTML fragment in the page shell."""
+        extra = f"<style>{extra_css}</style>\n" if extra_css else ""
+        return f"{self._head}{title}{self._after_title}{extra}{self._body}{body}{self._tail}"
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def get_theme(name=None, theme_file=None, asset_dir=None):
+    """Return the compiled theme, compiling it only on first use in this process.
+
+    name defaults to 'default'. theme_file is a JSON theme file; without it
+    only the built-in themes are available. A changed theme file is picked
+    up on the next call.
+    """
+    name = name or DEFAULT_THEME
+    theme_file = os.path.abspath(theme_file) if theme_file else None
+    asset_dir = os.path.abspath(asset_dir) if asset_dir else None
+    stamp = os.stat(theme_file).st_mtime_ns if theme_file else None
+    key = (name, theme_file, stamp, asset_dir)
+    with _compiled_lock:
+        theme = _compiled.get(key)
+        if theme is None:
+            themes = load_theme_file(theme_file) if theme_file else {}
+            base_dir = os.path.dirname(theme_file) if theme_file else None
+            theme = CompiledTheme(name, resolve_theme(name, themes, base_dir), asset_dir)
+            _compiled[key] = theme
+        return theme
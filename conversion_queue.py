@@ -0,0 +1,215 @@
+"""Multi-file conversion queue with parallel workers and per-item cancel.
+
+Items are converted by a configurable number of worker threads, each with its
+own MarkdownConverter (one wkhtmltopdf process per worker at a time). A failed
+item never stops the others. on_change(item) is called from worker threads
+whenever an item's status or progress changes, so a UI must hand it over to
+its own thread (see progress_channel.py).
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+
+from converter import MarkdownConverter
+from instrumentation import ConversionObserver
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class QueueItem:
+    _ids = itertools.count(1)
+
+    def __init__(self, input_file, output_file):
+        self.id = next(self._ids)
+        self.input_file = input_file
+        self.output_file = output_file
+        self.status = QUEUED
+        self.message = "Queued"
+        self.progress = 0
+        self.error = None
+        self.duration = None
+        self.converter = None
+        # Set by cancel(); survives the converter resetting its own flag at the start of convert()
+        self.cancel_requested = False
+
+
+class _ItemObserver(ConversionObserver):
+    """Forward one worker converter's status to the item it is converting."""
+
+    def __init__(self, conversion_queue, converter):
+        self.queue = conversion_queue
+        self.converter = converter
+        self.item = None
+
+    def on_stage_start(self, event):
+        item = self.item
+        if item is not None and item.cancel_requested:
+            # Re-apply a cancel that arrived before convert() reset the converter
+            self.converter.cancel()
+        if event.message is not None:
+            self.on_status(event.message, event.progress)
+
+    def on_status(self, message, progress):
+        item = self.item
+        if item is None or item.status != RUNNING:
+            return
+        item.message = message
+        if progress is not None:
+            item.progress = progress
+        self.queue._changed(item)
+
+
+class ConversionQueue:
+    def __init__(self, workers=2, converter_factory=None, on_change=None):
+        self.converter_factory = converter_factory or MarkdownConverter
+        self.on_change = on_change
+        self.items = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._target_workers = 0
+        self._threads = []
+        self.set_workers(workers)
+
+    def set_workers(self, workers):
+        """Change the number of parallel conversions; extra workers stop after their current item."""
+        with self._lock:
+            self._target_workers = max(1, workers)
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self._target_workers:
+                thread = threading.Thread(target=self._worker, name=f"queue-worker-{len(self._threads)}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def add(self, input_file, output_file):
+        item = QueueItem(input_file, output_file)
+        with self._lock:
+            self.items.append(item)
+        self._queue.put(item)
+        self._changed(item)
+        return item
+
+    def cancel(self, item):
+        """Cancel a queued item, or stop a running one at its next stage."""
+        with self._lock:
+            if item.status == QUEUED:
+                item.status = CANCELLED
+                item.message = "Cancelled"
+            elif item.status == RUNNING:
+                item.cancel_requested = True
+                if item.converter is not None:
+                    # Stops at the next stage, or kills a running wkhtmltopdf
+                    item.converter.cancel()
+                item.message = "Cancelling..."
+            else:
+                return
+        self._changed(item)
+
+    def cancel_all(self):
+        for item in list(self.items):
+            self.cancel(item)
+
+    def clear_finished(self):
+        """Forget finished items, so the totals only cover current work."""
+        with self._lock:
+            removed = [item for item in self.items if item.status in FINISHED]
+            self.items = [item for item in self.items if item.status not in FINISHED]
+        return removed
+
+    def counts(self):
+        """Number of items per status."""
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        with self._lock:
+            for item in self.items:
+                counts[item.status] += 1
+        return counts
+
+    def overall_progress(self):
+        """Aggregate progress of all items, 0-100; finished items count as complete."""
+        with self._lock:
+            if not self.items:
+                return 0
+            total = sum(100 if item.status in FINISHED else item.progress for item in self.items)
+            return total / len(self.items)
+
+    @property
+    def idle(self):
+        with self._lock:
+            return all(item.status in FINISHED for item in self.items)
+
+    def _changed(self, item):
+        if self.on_change is not None:
+            self.on_change(item)
+
+    def _remove_output(self, item):
+        try:
+            os.remove(item.output_file)
+        except OSError:
+            pass
+
+    def _retire(self):
+        # Called with the lock held: stop this thread if there are more workers than wanted
+        alive = [thread for thread in self._threads if thread.is_alive()]
+        if len(alive) > self._target_workers:
+            self._threads.remove(threading.current_thread())
+            return True
+        return False
+
+    def _worker(self):
+        converter = self.converter_factory()
+        observer = _ItemObserver(self, converter)
+        converter.add_observer(observer)
+        while True:
+            item = self._queue.get()
+            with self._lock:
+                if item.status != QUEUED:
+                    # Cancelled while waiting
+                    self._queue.task_done()
+                    continue
+                item.status = RUNNING
+                item.message = "Starting..."
+                item.converter = converter
+            observer.item = item
+            self._changed(item)
+
+            start = time.perf_counter()
+            try:
+                success = converter.convert(item.input_file, item.output_file)
+                error = converter.last_error
+            except Exception as e:
+                success, error = False, str(e)
+            item.duration = time.perf_counter() - start
+
+            with self._lock:
+                observer.item = None
+                item.converter = None
+                if item.cancel_requested:
+                    item.status = CANCELLED
+                    item.message = "Cancelled"
+                    if success:
+                        # Finished just before the cancel was noticed; honour the cancel anyway
+                        self._remove_output(item)
+                elif success:
+                    item.status = DONE
+                    item.message = f"Done in {item.duration:.1f}s"
+                else:
+                    item.status = FAILED
+                    item.error = error or "conversion failed"
+                    item.message = f"Failed: {item.error}"
+                item.progress = 100
+                retire = self._retire()
+            self._changed(item)
+            self._queue.task_done()
+            if retire:
+                return
+
+    def join(self):
+        """Wait until every item added so far has finished."""
+        self._queue.join()
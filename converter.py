@@ -1,92 +1,141 @@
-import tkinter as tk
-from tkinter import ttk, filedialog
-from tkinter.messagebox import showerror, showinfo
-import markdown2
-import pdfkit
+import json
 import os
+import shutil
 import sys
 import subprocess
 import tempfile
+import time
+import weakref
+from contextlib import contextmanager
 from pathlib import Path
 
+from fileutil import atomic_path, write_atomic
+from instrumentation import GuiProgressObserver, StageEvent, cpu_seconds, peak_rss_bytes
 
-class ConverterGUI:
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("Markdown to PDF Converter")
-        self.root.geometry("400x300")
-        self.root.resizable(False, False)
+# markdown2, pdfkit and asyncio are imported where they are used, so short CLI
+# runs and cache hits do not pay for loading them at startup.
 
-        self.style = ttk.Style()
-        self.style.configure('TButton', padding=10)
+# Where the discovered wkhtmltopdf path and version are remembered between runs
+DISCOVERY_STAMP = os.path.join(os.path.expanduser("~"), ".cache", "md_to_pdf", "wkhtmltopdf.json")
 
-        self.setup_ui()
+# fenced-code-blocks with highlightjs-lang renders ```lang blocks as
+# <pre><code class="language-lang"> without highlighting them itself
+MARKDOWN_EXTRAS = ['tables', 'code-friendly', 'fenced-code-blocks', 'highlightjs-lang']
 
-    def setup_ui(self):
-        main_frame = ttk.Frame(self.root, padding="20")
-        main_frame.pack(fill=tk.BOTH, expand=True)
+# How often a running wkhtmltopdf checks whether the conversion was cancelled
+CANCEL_POLL_SECONDS = 0.1
 
-        title_label = ttk.Label(
-            main_frame,
-            text="Convert Markdown to PDF",
-            font=('Helvetica', 14, 'bold')
-        )
-        title_label.pack(pady=10)
-
-        self.convert_btn = ttk.Button(
-            main_frame,
-            text="Select and Convert",
-        )
-        self.convert_btn.pack(pady=20)
-        self.convert_btn.config(command=self.on_convert_click)
-
-        # Add a cancel button for better user control
-        self.cancel_btn = ttk.Button(
-            main_frame,
-            text="Cancel",
-            state='disabled'
-        )
-        self.cancel_btn.pack(pady=5)
-
-        self.progress = ttk.Progressbar(
-            main_frame,
-            length=300,
-            mode='determinate'
-        )
-        self.progress.pack(pady=10)
-
-        self.status_label = ttk.Label(
-            main_frame,
-            text="Ready",
-            font=('Helvetica', 10)
-        )
-        self.status_label.pack(pady=10)
-
-    def show_status(self, message):
-        """Update the status label with the given message."""
-        self.status_label.config(text=message)
-        self.root.update()
 
-    def on_convert_click(self):
-        # This is just a placeholder - it will be overridden in the main app
-        pass
-
-    def update_progress(self, value):
-        """Update the progress bar with a value between 0-100."""
-        self.progress['value'] = value
-        self.root.update()
+class ConversionCancelled(Exception):
+    """Raised inside a conversion when cancel() stopped wkhtmltopdf."""
 
 
 class MarkdownConverter:
-    def __init__(self, gui):
+    def __init__(self, gui=None, cache=None, in_memory=False, incremental=False, image_pipeline=None,
+                 parser=None, highlighter=None, profile=None, theme=None, theme_file=None, asset_dir=None,
+                 max_input_bytes=None, memory_budget=None):
+        # The GUI is optional so the converter can also run headless (batch/CLI)
         self.gui = gui
+        # Observers receive stage start/end events (see instrumentation.py)
+        self.observers = []
+        if gui is not None:
+            self.add_observer(GuiProgressObserver(gui))
+        # Optional PdfCache; when set, unchanged inputs skip wkhtmltopdf
+        self.cache = cache
+        # Pipe HTML to wkhtmltopdf over stdin/stdout instead of using a temp file
+        self.in_memory = in_memory
+        # Markdown parser backend, e.g. 'markdown2' (default), 'markdown-it' or 'mistune'
+        from parsers import get_backend
+        self.parser_backend = get_backend(parser)
+        # Reuse cached HTML for unchanged markdown blocks across conversions
+        self.html_renderer = None
+        if incremental:
+            from incremental_html import IncrementalRenderer
+            self.html_renderer = IncrementalRenderer(MARKDOWN_EXTRAS, backend=self.parser_backend)
+        # Optional ImageAssetPipeline that downscales local images before rendering
+        self.image_pipeline = image_pipeline
+        # Optional CodeHighlighter for fenced code blocks (see highlight.py)
+        self.highlighter = highlighter
+        # Optional output size profile, e.g. 'screen', 'print' or 'archive' (see output_profiles.py)
+        self.profile_name = profile
+        self.profile = None
+        if profile:
+            from output_profiles import get_profile
+            self.profile = get_profile(profile)
+        # Compiled page theme: HTML shell and page options (see config.py)
+        from config import get_theme
+        self.theme = get_theme(theme, theme_file, asset_dir)
+        # Inputs above these limits are rejected before reading (None: input_reader defaults)
+        self.max_input_bytes = max_input_bytes
+        self.memory_budget = memory_budget
+        # Encoding detected for the last file read, e.g. 'utf-8' or 'utf-16'
+        self.last_encoding = None
+        # Markdown, PDF and optimized PDF sizes of the last conversion
+        self.last_sizes = None
         self.cancelled = False
+        self.last_error = None
+        self.last_cache_hit = False
+        # Files the last conversion read: the markdown plus local images it references
+        self.last_inputs = []
+        # Seconds the last preview() took, for tracking draft latency
+        self.last_preview_latency = None
+        self._wkhtmltopdf_version = None
+        self.discovery_from_stamp = False
+        # Upper bound on concurrent wkhtmltopdf processes for the async API
+        self.max_concurrent_processes = os.cpu_count() or 1
+        # asyncio semaphores belong to one event loop, so keep one per running loop
+        self._process_semaphores = weakref.WeakKeyDictionary()
         # Check for wkhtmltopdf installation
-        self.wkhtmltopdf_path = self._find_wkhtmltopdf()
+        self.wkhtmltopdf_path = self._discover_wkhtmltopdf()
+        self._pdfkit_configuration = None
         print(f"Using wkhtmltopdf path: {self.wkhtmltopdf_path}")
 
+    def _discover_wkhtmltopdf(self):
+        """Find wkhtmltopdf, reusing the on-disk stamp while the binary is unchanged."""
+        stamp = self._load_discovery_stamp()
+        if stamp:
+            self.discovery_from_stamp = True
+            self._wkhtmltopdf_version = stamp.get('version')
+            return stamp['path']
+
+        path = self._find_wkhtmltopdf()
+        if isinstance(path, bytes):
+            # pdfkit.configuration() returns the path as bytes
+            path = path.decode('utf-8')
+        if path:
+            self._save_discovery_stamp(path, None)
+        return path
+
+    def _load_discovery_stamp(self):
+        """Return the saved discovery result if the binary's mtime still matches."""
+        try:
+            with open(DISCOVERY_STAMP, 'r', encoding='utf-8') as f:
+                stamp = json.load(f)
+            if os.stat(stamp['path']).st_mtime_ns == stamp['mtime_ns']:
+                return stamp
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _save_discovery_stamp(self, path, version):
+        try:
+            resolved = path if os.path.isabs(path) else shutil.which(path)
+            if not resolved:
+                return
+            stamp = {
+                'path': resolved,
+                'mtime_ns': os.stat(resolved).st_mtime_ns,
+                'version': version,
+            }
+            os.makedirs(os.path.dirname(DISCOVERY_STAMP), exist_ok=True)
+            write_atomic(DISCOVERY_STAMP, json.dumps(stamp))
+        except OSError as e:
+            print(f"Error saving wkhtmltopdf discovery stamp: {str(e)}")
+
     def _find_wkhtmltopdf(self):
         """Try to find the wkhtmltopdf executable."""
+        import pdfkit
+
         # Try to get path from pdfkit config
         try:
             return pdfkit.configuration().wkhtmltopdf
@@ -133,6 +182,67 @@ class MarkdownConverter:
         """Cancel the current conversion process."""
         self.cancelled = True
 
+    def get_wkhtmltopdf_version(self):
+        """Return the wkhtmltopdf version string (looked up once per converter)."""
+        if self._wkhtmltopdf_version is None:
+            try:
+                result = subprocess.run(
+                    [self._wkhtmltopdf_command(), '--version'],
+                    check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+                )
+                self._wkhtmltopdf_version = result.stdout.decode('utf-8', 'replace').strip()
+                if self.wkhtmltopdf_path:
+                    self._save_discovery_stamp(self._wkhtmltopdf_command(), self._wkhtmltopdf_version)
+            except Exception as e:
+                print(f"Error getting wkhtmltopdf version: {str(e)}")
+                self._wkhtmltopdf_version = "unknown"
+        return self._wkhtmltopdf_version
+
+    def _wkhtmltopdf_command(self):
+        path = self.wkhtmltopdf_path or 'wkhtmltopdf'
+        if isinstance(path, bytes):
+            # pdfkit.configuration() returns the path as bytes
+            path = path.decode('utf-8')
+        return path
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def report(self, message, progress):
+        """Send a status message and progress value to the observers."""
+        for observer in self.observers:
+            observer.on_status(message, progress)
+
+    @contextmanager
+    def stage(self, name, input_file=None, message=None, progress=None, bytes_in=None):
+        """Time one conversion stage and announce its start and end to the observers.
+
+        The yielded StageEvent can be given bytes_out before the block ends.
+        """
+        event = StageEvent(name, input_file, message, progress, bytes_in)
+        if not self.observers:
+            yield event
+            return
+
+        for observer in self.observers:
+            observer.on_stage_start(event)
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        try:
+            yield event
+        except BaseException as e:
+            event.error = str(e) or type(e).__name__
+            raise
+        finally:
+            event.wall_time = time.perf_counter() - wall_start
+            event.cpu_time = cpu_seconds() - cpu_start
+            event.peak_rss = peak_rss_bytes()
+            for observer in self.observers:
+                observer.on_stage_end(event)
+
     def check_dependencies(self):
         """Check if all required dependencies are installed."""
         if not self.wkhtmltopdf_path:
@@ -146,130 +256,139 @@ class MarkdownConverter:
         temp_html_path = None
         try:
             self.cancelled = False
+            self.last_error = None
+            self.last_cache_hit = False
+            self.last_inputs = [input_file]
+            self.last_sizes = None
 
             # Check dependencies first
-            self.gui.show_status("Checking dependencies...")
-            self.gui.update_progress(10)
-            self.check_dependencies()
+            with self.stage("check", input_file, "Checking dependencies...", 10):
+                self.check_dependencies()
 
             if self.cancelled:
                 return False
 
             # Step 1: Read the markdown file
-            self.gui.show_status("Reading markdown file...")
-            self.gui.update_progress(20)
-            content = self.read_file(input_file)
+            with self.stage("read", input_file, "Reading markdown file...", 20) as event:
+                event.bytes_in = os.path.getsize(input_file)
+                content = self.read_file(input_file)
+                event.bytes_out = len(content)
 
             if self.cancelled:
                 return False
 
-            # Step 2: Convert markdown to HTML
-            self.gui.show_status("Converting markdown to HTML...")
-            self.gui.update_progress(40)
-            html = markdown2.markdown(content, extras=['tables', 'code-friendly'])
+            base_dir = os.path.dirname(os.path.abspath(input_file))
+            cache_key = None
+            if self.cache is not None:
+                from image_assets import find_markdown_images
+
+                with self.stage("cache_lookup", input_file, bytes_in=len(content)) as event:
+                    # The key covers the images the markdown references, found without rendering it
+                    images = find_markdown_images(content, base_dir)
+                    cache_key = self.get_cache_key(content, Path(input_file).stem, images)
+                    hit = self.cache.fetch(cache_key, output_file)
+                    event.bytes_out = os.path.getsize(output_file) if hit else 0
+                if hit:
+                    self.last_cache_hit = True
+                    self.last_inputs.extend(images)
+                    print(f"Cache hit for {input_file}")
+                    self.report("Conversion completed successfully (cached)!", 100)
+                    return True
 
-            # Add basic styling to HTML
-            html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <title>{Path(input_file).stem}</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; margin: 2em; }}
-                    h1, h2, h3 {{ color: #333; }}
-                    code {{ background-color: #f4f4f4; border-radius: 3px; padding: 2px 5px; }}
-                    pre {{ background-color: #f4f4f4; border-radius: 5px; padding: 10px; overflow-x: auto; }}
-                    blockquote {{ border-left: 5px solid #ddd; padding-left: 15px; color: #555; }}
-                    img {{ max-width: 100%; }}
-                    table {{ border-collapse: collapse; width: 100%; }}
-                    th, td {{ border: 1px solid #ddd; padding: 8px; }}
-                </style>
-            </head>
-            <body>
-                {html}
-            </body>
-            </html>
-            """
+            # Step 2: Convert markdown to HTML
+            with self.stage("markdown", input_file, "Converting markdown to HTML...", 40,
+                            bytes_in=len(content)) as event:
+                html = self.markdown_to_html(content)
+                event.bytes_out = len(html)
 
-            if self.cancelled:
-                return False
+            from image_assets import find_local_images
+            self.last_inputs.extend(find_local_images(html, base_dir))
 
-            # Step 3: Create temporary HTML file
-            # Use tempfile module to create a temporary file with appropriate suffix
-            fd, temp_html_path = tempfile.mkstemp(suffix=".html")
-            os.close(fd)
+            if self.image_pipeline is not None:
+                with self.stage("images", input_file, bytes_in=len(html)) as event:
+                    html = self.process_images(html, input_file)
+                    event.bytes_out = len(html)
 
-            self.gui.show_status(f"Creating HTML file at {temp_html_path}...")
-            self.gui.update_progress(60)
+            if self.highlighter is not None:
+                with self.stage("highlight", input_file, bytes_in=len(html)) as event:
+                    html = self.highlight_code(html)
+                    event.bytes_out = len(html)
 
-            with open(temp_html_path, 'w', encoding='utf-8') as f:
-                f.write(html)
+            # Add basic styling to HTML
+            html = self.wrap_html(html, Path(input_file).stem)
 
             if self.cancelled:
-                # Clean up temp file
-                if temp_html_path and os.path.exists(temp_html_path):
-                    try:
-                        os.remove(temp_html_path)
-                    except:
-                        pass
                 return False
 
-            # Step 4: Convert HTML to PDF
-            self.gui.show_status("Converting HTML to PDF...")
-            self.gui.update_progress(80)
-
-            # Configure pdfkit
-            options = {
-                'quiet': '',
-                'page-size': 'A4',
-                'margin-top': '20mm',
-                'margin-right': '20mm',
-                'margin-bottom': '20mm',
-                'margin-left': '20mm',
-                'encoding': 'UTF-8',
-                # Remove verbose option as it's not supported in all versions
-            }
-
             # Ensure output directory exists
             output_dir = os.path.dirname(os.path.abspath(output_file))
             os.makedirs(output_dir, exist_ok=True)
 
-            print(f"Converting {temp_html_path} to {output_file}")
-
-            # Create PDF configuration
-            if self.wkhtmltopdf_path and self.wkhtmltopdf_path != 'wkhtmltopdf':
-                config = pdfkit.configuration(wkhtmltopdf=self.wkhtmltopdf_path)
-                print(f"Using wkhtmltopdf path: {self.wkhtmltopdf_path}")
-                pdfkit.from_file(temp_html_path, output_file, options=options, configuration=config)
+            # Rendered PDFs are always published with os.replace: a cache hit may have
+            # hard-linked output_file to a cache entry, which must not be written into
+            if self.in_memory:
+                # Step 3: Convert HTML to PDF over stdin/stdout, no temp file
+                with self.stage("wkhtmltopdf", input_file, "Converting HTML to PDF...", 80,
+                                bytes_in=len(html)) as event:
+                    print(f"Converting {input_file} to {output_file} in memory")
+                    pdf = self.html_to_pdf_bytes(html)
+                    event.bytes_out = len(pdf)
+                with self.stage("write_pdf", input_file, bytes_in=len(pdf)) as event:
+                    write_atomic(output_file, pdf)
+                    event.bytes_out = len(pdf)
             else:
-                print("Using default wkhtmltopdf from PATH")
-                pdfkit.from_file(temp_html_path, output_file, options=options)
+                # Step 3: Create temporary HTML file
+                # Use tempfile module to create a temporary file with appropriate suffix
+                fd, temp_html_path = tempfile.mkstemp(suffix=".html")
+                os.close(fd)
+
+                with self.stage("write_html", input_file, f"Creating HTML file at {temp_html_path}...", 60,
+                                bytes_in=len(html)) as event:
+                    with open(temp_html_path, 'w', encoding='utf-8') as f:
+                        f.write(html)
+                    event.bytes_out = os.path.getsize(temp_html_path)
+
+                if self.cancelled:
+                    return False
+
+                # Step 4: Convert HTML to PDF
+                import pdfkit
+
+                with self.stage("wkhtmltopdf", input_file, "Converting HTML to PDF...", 80,
+                                bytes_in=len(html)) as event:
+                    print(f"Converting {temp_html_path} to {output_file}")
+                    kit = pdfkit.PDFKit(temp_html_path, 'file', **self.pdfkit_kwargs())
+                    with atomic_path(output_file) as temp_pdf:
+                        self._run_wkhtmltopdf_cancellable(kit, temp_pdf)
+
+                        # Check if the PDF was actually created
+                        if not os.path.exists(temp_pdf) or os.path.getsize(temp_pdf) == 0:
+                            raise RuntimeError("PDF file was not created successfully")
+                        event.bytes_out = os.path.getsize(temp_pdf)
 
-            # Clean up temp file
-            if temp_html_path and os.path.exists(temp_html_path):
-                try:
-                    os.remove(temp_html_path)
-                except Exception as e:
-                    print(f"Error removing temp file: {str(e)}")
+                # Clean up temp file
+                if temp_html_path and os.path.exists(temp_html_path):
+                    try:
+                        os.remove(temp_html_path)
+                    except Exception as e:
+                        print(f"Error removing temp file: {str(e)}")
 
-            # Check if the PDF was actually created
-            if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
-                raise RuntimeError("PDF file was not created successfully")
+            self.optimize_output(input_file, output_file, len(content.encode('utf-8')))
 
-            self.gui.show_status("Conversion completed successfully!")
-            self.gui.update_progress(100)
+            if cache_key is not None:
+                with self.stage("cache_store", input_file):
+                    self.cache.store(cache_key, output_file)
 
-            # Show success message with file path
-            showinfo("Conversion Complete", f"PDF saved to:\n{output_file}")
+            self.report("Conversion completed successfully!", 100)
             return True
 
+        except ConversionCancelled:
+            return False
         except Exception as e:
+            self.last_error = str(e)
             error_msg = f"Error: {str(e)}"
             print(error_msg)
-            self.gui.show_status(error_msg)
-            self.gui.update_progress(0)
-            showerror("Conversion Error", f"Failed to convert: {str(e)}")
+            self.report(error_msg, 0)
             return False
         finally:
             # Make sure to clean up temp file
@@ -279,12 +398,373 @@ class MarkdownConverter:
                 except:
                     pass
 
-    def read_file(self, input_file):
-        """Read markdown content from a file."""
+    async def convert_async(self, input_file, output_file, timeout=None):
+        """Convert markdown to PDF from an asyncio event loop.
+
+        wkhtmltopdf runs via asyncio.create_subprocess_exec in its own process
+        group, and at most max_concurrent_processes run at once in each event
+        loop; the limit is read when a loop first converts. If the task is
+        cancelled or timeout (seconds) expires, the whole process group is
+        killed. Raises on failure; returns True on success.
+        """
+        import asyncio
+        import pdfkit
+
+        self.check_dependencies()
+        loop = asyncio.get_running_loop()
+        # Reading and markdown2 are blocking, keep them off the event loop
+        content = await loop.run_in_executor(None, self.read_file, input_file)
+        title = Path(input_file).stem
+
+        cache_key = None
+        if self.cache is not None:
+            from image_assets import find_markdown_images
+            images = find_markdown_images(content, os.path.dirname(os.path.abspath(input_file)))
+            cache_key = await loop.run_in_executor(None, self.get_cache_key, content, title, images)
+            if self.cache.fetch(cache_key, output_file):
+                return True
+
+        body = await loop.run_in_executor(None, self.markdown_to_html, content)
+        body = await loop.run_in_executor(None, self.process_images, body, input_file)
+        body = await loop.run_in_executor(None, self.highlight_code, body)
+        html = self.wrap_html(body, title)
+
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        os.makedirs(output_dir, exist_ok=True)
+        kit = pdfkit.PDFKit(html, 'string', **self.pdfkit_kwargs())
+
+        semaphore = self._process_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrent_processes)
+            self._process_semaphores[loop] = semaphore
+
+        async with semaphore:
+            with self.stage("wkhtmltopdf", input_file, bytes_in=len(html)) as event:
+                with atomic_path(output_file) as temp_pdf:
+                    # Let pdfkit build the command line so options stay identical to convert()
+                    await self._run_wkhtmltopdf(kit.command(temp_pdf), html.encode('utf-8'), temp_pdf, timeout)
+                    if not os.path.exists(temp_pdf) or os.path.getsize(temp_pdf) == 0:
+                        raise RuntimeError("PDF file was not created successfully")
+                    event.bytes_out = os.path.getsize(temp_pdf)
+        await loop.run_in_executor(None, self.optimize_output, input_file, output_file,
+                                   len(content.encode('utf-8')))
+        if cache_key is not None:
+            self.cache.store(cache_key, output_file)
+        return True
+
+    async def convert_many(self, jobs, timeout=None):
+        """Convert (input_file, output_file) pairs concurrently.
+
+        Returns one entry per job, in order: True on success or the exception
+        that job raised. Cancelling convert_many cancels every job.
+        """
+        import asyncio
+
+        tasks = [
+            asyncio.ensure_future(self.convert_async(input_file, output_file, timeout=timeout))
+            for input_file, output_file in jobs
+        ]
         try:
-            with open(input_file, 'r', encoding='utf-8') as file:
-                return file.read()
-        except UnicodeDecodeError:
-            # Try with a different encoding if UTF-8 fails
-            with open(input_file, 'r', encoding='latin-1') as file:
-                return file.read()
\ No newline at end of file
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _run_wkhtmltopdf(self, command, html_bytes, output_file, timeout):
+        """Run one wkhtmltopdf process, killing its process group if interrupted."""
+        import asyncio
+
+        if sys.platform == 'win32':
+            process = await asyncio.create_subprocess_exec(
+                *command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
+            )
+        else:
+            process = await asyncio.create_subprocess_exec(
+                *command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                start_new_session=True
+            )
+
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(html_bytes), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self._kill_process_group(process)
+            await process.wait()
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            raise
+
+        if process.returncode != 0:
+            message = stderr.decode('utf-8', 'replace').strip()
+            raise RuntimeError(f"wkhtmltopdf exited with code {process.returncode}: {message}")
+
+    def _run_wkhtmltopdf_cancellable(self, kit, output_file):
+        """Run a pdfkit.PDFKit job, killing wkhtmltopdf as soon as cancel() is called.
+
+        Raises ConversionCancelled if the conversion was cancelled, and like pdfkit on errors.
+        """
+        if sys.platform == 'win32':
+            group = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            group = {'start_new_session': True}
+        process = subprocess.Popen(kit.command(output_file), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   env=kit.environ, **group)
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=CANCEL_POLL_SECONDS)
+                break
+            except subprocess.TimeoutExpired:
+                if self.cancelled:
+                    self._kill_process_group(process)
+                    process.wait()
+                    raise ConversionCancelled()
+        kit.handle_error(process.returncode, (stderr or stdout or b"").decode('utf-8', 'replace'))
+
+    def _kill_process_group(self, process):
+        import signal
+
+        if process.returncode is not None:
+            return
+        try:
+            if sys.platform == 'win32':
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def convert_bytes(self, markdown, title="document"):
+        """Convert markdown bytes to PDF bytes without touching the disk.
+
+        The HTML is sent to wkhtmltopdf over stdin and the PDF read back from
+        stdout, so results can be streamed straight to a socket or object store.
+        Raises on failure instead of returning False.
+        """
+        self.check_dependencies()
+        content = self.decode_markdown(markdown)
+        with self.stage("markdown", title, bytes_in=len(markdown)) as event:
+            html = self.markdown_to_html(content)
+            html = self.wrap_html(self.highlight_code(self.process_images(html)), title)
+            event.bytes_out = len(html)
+        with self.stage("wkhtmltopdf", title, bytes_in=len(html)) as event:
+            pdf = self.html_to_pdf_bytes(html)
+            event.bytes_out = len(pdf)
+        if self.profile is not None and self.profile['optimize']:
+            from output_profiles import optimize_pdf
+
+            with self.stage("optimize", title, bytes_in=len(pdf)) as event:
+                pdf = optimize_pdf(pdf, self.profile['image_quality'])
+                event.bytes_out = len(pdf)
+        return pdf
+
+    def html_to_pdf_bytes(self, html):
+        """Render an HTML string to PDF bytes via wkhtmltopdf stdin/stdout."""
+        import pdfkit
+
+        pdf = pdfkit.from_string(html, False, **self.pdfkit_kwargs())
+        if not pdf:
+            raise RuntimeError("wkhtmltopdf returned an empty PDF")
+        return pdf
+
+    def preview(self, input_file, output_file, pages=1, section=None):
+        """Render a fast, low-fidelity draft of input_file and return its latency in seconds.
+
+        Only the section under the heading `section`, or roughly the first
+        `pages` pages, is rendered, with low-quality wkhtmltopdf settings and
+        without the PDF cache or image downscaling. An output_file ending in
+        .png gets a thumbnail of the first page (needs wkhtmltoimage). Use
+        convert() for the full, print-quality render. Raises on failure.
+        """
+        import preview
+
+        start = time.perf_counter()
+        self.check_dependencies()
+        with self.stage("preview", input_file, "Rendering preview...", 10) as preview_event:
+            content = self.read_file(input_file)
+            preview_event.bytes_in = len(content)
+            if section:
+                selected = preview.extract_section(content, section)
+                if selected is None:
+                    raise ValueError(f"No heading '{section}' in {input_file}")
+            else:
+                selected = preview.leading_blocks(content, pages)
+
+            with self.stage("markdown", input_file, bytes_in=len(selected)) as event:
+                html = self.wrap_html(self.markdown_to_html(selected), Path(input_file).stem)
+                event.bytes_out = len(html)
+
+            output_dir = os.path.dirname(os.path.abspath(output_file))
+            os.makedirs(output_dir, exist_ok=True)
+            if output_file.lower().endswith('.png'):
+                with self.stage("wkhtmltoimage", input_file, bytes_in=len(html)) as event:
+                    data = self._html_to_png_bytes(html)
+                    event.bytes_out = len(data)
+            else:
+                import pdfkit
+
+                kwargs = self.pdfkit_kwargs()
+                kwargs['options'].update(preview.PREVIEW_PDF_OPTIONS)
+                with self.stage("wkhtmltopdf", input_file, bytes_in=len(html)) as event:
+                    data = pdfkit.from_string(html, False, **kwargs)
+                    if not data:
+                        raise RuntimeError("wkhtmltopdf returned an empty PDF")
+                    if not section:
+                        data = preview.trim_pages(data, pages)
+                    event.bytes_out = len(data)
+
+            write_atomic(output_file, data)
+            preview_event.bytes_out = len(data)
+
+        self.last_preview_latency = time.perf_counter() - start
+        self.report(f"Preview ready in {self.last_preview_latency:.2f}s", 100)
+        return self.last_preview_latency
+
+    def _find_wkhtmltoimage(self):
+        # wkhtmltoimage ships next to wkhtmltopdf
+        sibling = os.path.join(os.path.dirname(self._wkhtmltopdf_command()),
+                               'wkhtmltoimage.exe' if sys.platform == 'win32' else 'wkhtmltoimage')
+        if os.path.isfile(sibling):
+            return sibling
+        return shutil.which('wkhtmltoimage')
+
+    def _html_to_png_bytes(self, html):
+        """Render the first page of an HTML string to a PNG thumbnail with wkhtmltoimage."""
+        import preview
+
+        command = self._find_wkhtmltoimage()
+        if not command:
+            raise RuntimeError(
+                "wkhtmltoimage not found. It is installed with wkhtmltopdf: https://wkhtmltopdf.org/downloads.html"
+            )
+        result = subprocess.run(
+            [command, '--quiet', '--format', 'png', '--disable-javascript',
+             '--width', str(preview.THUMBNAIL_WIDTH), '--crop-h', str(preview.THUMBNAIL_HEIGHT), '-', '-'],
+            input=html.encode('utf-8'), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        if result.returncode != 0 or not result.stdout:
+            raise RuntimeError(f"wkhtmltoimage failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout
+
+    def optimize_output(self, input_file, output_file, markdown_bytes):
+        """Run the profile's optimization pass on output_file and report the sizes."""
+        pdf_bytes = os.path.getsize(output_file)
+        self.last_sizes = {
+            'input_bytes': markdown_bytes,
+            'pdf_bytes': pdf_bytes,
+            'output_bytes': pdf_bytes,
+            'optimize_seconds': 0.0,
+        }
+        if self.profile is None or not self.profile['optimize']:
+            return
+
+        from output_profiles import optimize_pdf
+
+        start = time.perf_counter()
+        with self.stage("optimize", input_file, "Optimizing PDF...", 90, bytes_in=pdf_bytes) as event:
+            with open(output_file, 'rb') as f:
+                data = f.read()
+            optimized = optimize_pdf(data, self.profile['image_quality'])
+            if optimized is not data:
+                write_atomic(output_file, optimized)
+            event.bytes_out = len(optimized)
+        self.last_sizes['output_bytes'] = len(optimized)
+        self.last_sizes['optimize_seconds'] = time.perf_counter() - start
+        print(f"Sizes for {input_file}: markdown {markdown_bytes} bytes, PDF {pdf_bytes} -> "
+              f"{len(optimized)} bytes ({self.profile_name}, optimized in "
+              f"{self.last_sizes['optimize_seconds']:.2f}s)")
+
+    def pdf_options(self):
+        """wkhtmltopdf options for this converter."""
+        options = dict(self.theme.options)
+        if self.profile is not None:
+            options.update(self.profile['options'])
+        if self.image_pipeline is not None:
+            # Rewritten images are absolute file:// URIs, which newer wkhtmltopdf blocks by default
+            options['enable-local-file-access'] = ''
+        return options
+
+    def pdfkit_kwargs(self):
+        """Keyword arguments shared by every pdfkit call."""
+        import pdfkit
+
+        kwargs = {'options': self.pdf_options()}
+        if self.wkhtmltopdf_path and self.wkhtmltopdf_path != 'wkhtmltopdf':
+            if self._pdfkit_configuration is None:
+                # Built once per converter rather than on every conversion
+                self._pdfkit_configuration = pdfkit.configuration(wkhtmltopdf=self.wkhtmltopdf_path)
+            kwargs['configuration'] = self._pdfkit_configuration
+        return kwargs
+
+    def get_cache_key(self, content, title, images=()):
+        """Hash the markdown, the local images it references and every setting that changes the PDF."""
+        from pdf_cache import cache_key
+
+        image_settings = None
+        if self.image_pipeline is not None:
+            image_settings = [self.image_pipeline.max_width, self.image_pipeline.jpeg_quality]
+        assets = []
+        for path in images:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            assets.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+        return cache_key(
+            content.encode('utf-8'),
+            MARKDOWN_EXTRAS,
+            self.theme.fingerprint + (self.highlighter.css if self.highlighter is not None else ""),
+            self.pdf_options(),
+            self.get_wkhtmltopdf_version(),
+            title=title,
+            parser=self.parser_backend.name,
+            profile=self.profile_name,
+            images=image_settings,
+            assets=assets
+        )
+
+    def markdown_to_html(self, content):
+        """Render markdown to an HTML fragment, incrementally if enabled."""
+        if self.html_renderer is not None:
+            return self.html_renderer.render(content)
+        return self.parser_backend.render(content)
+
+    def process_images(self, html, input_file=None):
+        """Run the image pre-render stage on an HTML fragment, if enabled."""
+        if self.image_pipeline is None:
+            return html
+        base_dir = os.path.dirname(os.path.abspath(input_file)) if input_file else None
+        return self.image_pipeline.process_html(html, base_dir)
+
+    def highlight_code(self, html):
+        """Syntax-highlight fenced code blocks in an HTML fragment, if enabled."""
+        if self.highlighter is None:
+            return html
+        return self.highlighter.highlight_html(html)
+
+    def wrap_html(self, body, title):
+        """Wrap an HTML fragment in the theme's page shell."""
+        extra_css = ""
+        if self.highlighter is not None and 'class="highlight"' in body:
+            # One stylesheet per document, however many code blocks it has
+            extra_css = self.highlighter.css
+        return self.theme.render(title, body, extra_css)
+
+    def read_file(self, input_file):
+        """Read markdown content from a file, detecting its encoding (see input_reader.py)."""
+        from input_reader import read_markdown
+
+        decoded = read_markdown(input_file, self.max_input_bytes, self.memory_budget)
+        self.last_encoding = decoded.encoding
+        if decoded.encoding != 'utf-8' or decoded.replaced:
+            print(f"Read {input_file} as {decoded.describe()}")
+        return decoded.text
+
+    def decode_markdown(self, data):
+        """Decode markdown bytes, detecting the encoding like read_file."""
+        from input_reader import decode_bytes
+
+        decoded = decode_bytes(data)
+        self.last_encoding = decoded.encoding
+        return decoded.text
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""File helpers shared by the caches, the build database and the workers."""
+import contextlib
+import hashlib
+import os
+import threading
+
+
+def temp_name(path):
+    """Unique sibling name used to publish path atomically with os.replace."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """Yield a temporary path to write, then move it to path with os.replace.
+
+    Readers see the old file or the new one, never a partial file. The
+    temporary file is removed if writing fails.
+    """
+    temp_path = temp_name(path)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_atomic(path, data):
+    """Write bytes, or text as UTF-8, to path atomically."""
+    with atomic_path(path) as temp_path:
+        if isinstance(data, str):
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+        else:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+
+
+def file_digest(path):
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def require_pypdf(purpose):
+    """Import pypdf, or raise RuntimeError saying what it is needed for."""
+    try:
+        import pypdf
+    except ImportError:
+        raise RuntimeError(f"pypdf is required {purpose}. Install it with: pip install pypdf")
+    return pypdf
@@ -2,19 +2,24 @@ import tkinter as tk
 from tkinter import ttk, filedialog
 from tkinter.messagebox import showerror
 
+from progress_channel import ProgressChannel
+
 
 class ConverterGUI:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Markdown to PDF Converter")
-        self.root.geometry("400x300")
-        self.root.resizable(False, False)
+        self.root.geometry("640x520")
 
         self.style = ttk.Style()
         self.style.configure('TButton', padding=10)
 
         self.setup_ui()
 
+        # Conversion threads post here; the Tk loop applies the latest state each frame
+        self.channel = ProgressChannel()
+        self.channel.pump(self.root, self.apply_update)
+
     def setup_ui(self):
         main_frame = ttk.Frame(self.root, padding="20")
         main_frame.pack(fill=tk.BOTH, expand=True)
@@ -26,26 +31,70 @@ class ConverterGUI:
         )
         title_label.pack(pady=10)
 
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=5)
+
         self.convert_btn = ttk.Button(
-            main_frame,
+            button_frame,
             text="Select and Convert",
         )
-        self.convert_btn.pack(pady=20)
+        self.convert_btn.pack(side=tk.LEFT, padx=5)
+
+        self.folder_btn = ttk.Button(
+            button_frame,
+            text="Convert Folder",
+        )
+        self.folder_btn.pack(side=tk.LEFT, padx=5)
+
+        # Number of files converted in parallel
+        ttk.Label(button_frame, text="Workers:").pack(side=tk.LEFT, padx=(10, 2))
+        self.workers_var = tk.IntVar(value=2)
+        self.workers_spin = ttk.Spinbox(
+            button_frame,
+            from_=1,
+            to=16,
+            width=3,
+            textvariable=self.workers_var
+        )
+        self.workers_spin.pack(side=tk.LEFT)
+
+        # Per-file status list
+        list_frame = ttk.Frame(main_frame)
+        list_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        self.file_list = ttk.Treeview(list_frame, columns=('status',), height=8)
+        self.file_list.heading('#0', text="File")
+        self.file_list.heading('status', text="Status")
+        self.file_list.column('#0', width=300)
+        self.file_list.column('status', width=260)
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.file_list.yview)
+        self.file_list.configure(yscrollcommand=scrollbar.set)
+        self.file_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        cancel_frame = ttk.Frame(main_frame)
+        cancel_frame.pack(pady=5)
+
+        self.cancel_selected_btn = ttk.Button(
+            cancel_frame,
+            text="Cancel Selected",
+            state='disabled'
+        )
+        self.cancel_selected_btn.pack(side=tk.LEFT, padx=5)
 
         # Add a cancel button
         self.cancel_btn = ttk.Button(
-            main_frame,
+            cancel_frame,
             text="Cancel",
             state='disabled'
         )
-        self.cancel_btn.pack(pady=5)
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
 
         self.progress = ttk.Progressbar(
             main_frame,
             length=300,
             mode='determinate'
         )
-        self.progress.pack(pady=10)
+        self.progress.pack(fill=tk.X, pady=10)
 
         self.status_label = ttk.Label(
             main_frame,
@@ -55,11 +104,36 @@ class ConverterGUI:
         self.status_label.pack(pady=10)
 
     def show_status(self, message):
-        """Update the status label with the given message."""
-        self.status_label.config(text=message)
-        self.root.update()
+        """Update the status label with the given message; safe from any thread."""
+        self.channel.post(message=message)
 
     def update_progress(self, value):
-        """Update the progress bar with a value between 0-100."""
-        self.progress['value'] = value
-        self.root.update()
\ No newline at end of file
+        """Update the progress bar with a value between 0-100; safe from any thread."""
+        self.channel.post(progress=value)
+
+    def run_on_ui_thread(self, func, *args):
+        """Run func(*args) on the Tk thread at the next frame."""
+        self.channel.call(func, *args)
+
+    def add_file_row(self, key, name, status):
+        """Add a row to the per-file status list."""
+        self.file_list.insert('', tk.END, iid=str(key), text=name, values=(status,))
+
+    def selected_file_keys(self):
+        """Keys of the rows selected in the per-file status list."""
+        return list(self.file_list.selection())
+
+    def apply_update(self, key, state):
+        """Draw the latest coalesced state of a progress key (runs on the Tk thread).
+
+        The key None is the overall status line; any other key is a row of the
+        per-file status list.
+        """
+        if key is not None:
+            if 'message' in state and self.file_list.exists(str(key)):
+                self.file_list.set(str(key), 'status', state['message'])
+            return
+        if 'message' in state:
+            self.status_label.config(text=state['message'])
+        if 'progress' in state:
+            self.progress['value'] = state['progress']
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""Syntax highlighting for fenced code blocks, with a persistent cache.
+
+Every parser backend renders a fenced block with a language as
+<pre><code class="language-xxx">. Those blocks are re-lexed with Pygments
+and replaced by highlighted HTML. Results are cached on disk (and in memory)
+keyed by language, snippet hash, style and Pygments version, so rebuilds of
+documents full of identical snippets do not lex them again. The stylesheet is
+emitted once per document by MarkdownConverter.wrap_html.
+"""
+import hashlib
+import html as html_lib
+import os
+import re
+import threading
+
+from fileutil import write_atomic
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "md_to_pdf", "highlight")
+DEFAULT_STYLE = 'default'
+CSS_CLASS = 'highlight'
+
+CODE_BLOCK_RE = re.compile(
+    r'<pre><code class="(?:[^"]*\s)?language-([\w+#.-]+)[^"]*">(.*?)</code></pre>',
+    re.DOTALL
+)
+
+
+def _require_pygments():
+    try:
+        import pygments
+    except ImportError:
+        raise RuntimeError(
+            "Pygments is required for syntax highlighting. Install it with: pip install pygments"
+        )
+    return pygments
+
+
+class CodeHighlighter:
+    def __init__(self, style=DEFAULT_STYLE, cache_dir=None, max_memory_entries=4096):
+        self.pygments = _require_pygments()
+        from pygments.formatters import HtmlFormatter
+        from pygments.styles import get_style_by_name
+        from pygments.util import ClassNotFound
+
+        try:
+            get_style_by_name(style)
+        except ClassNotFound:
+            raise ValueError(f"Unknown highlight style '{style}'")
+        self.style = style
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_memory_entries = max_memory_entries
+        self.formatter = HtmlFormatter(style=style, cssclass=CSS_CLASS)
+        self.css = self.formatter.get_style_defs(f'.{CSS_CLASS}')
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def highlight_html(self, html):
+        """Replace fenced code blocks that name a language with highlighted HTML."""
+        def replace(match):
+            language, escaped = match.groups()
+            highlighted = self.highlight(html_lib.unescape(escaped), language.lower())
+            return match.group(0) if highlighted is None else highlighted
+
+        return CODE_BLOCK_RE.sub(replace, html)
+
+    def cache_key(self, code, language):
+        digest = hashlib.sha256()
+        for part in (language, self.style, self.pygments.__version__, code):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def highlight(self, code, language):
+        """Return highlighted HTML for code, or None if the language is unknown."""
+        key = self.cache_key(code, language)
+        with self._lock:
+            cached = self._memory.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        path = os.path.join(self.cache_dir, key[:2], f"{key}.html")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                highlighted = f.read()
+            self.hits += 1
+        except FileNotFoundError:
+            highlighted = self._render(code, language)
+            self.misses += 1
+            if highlighted is None:
+                return None
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, highlighted)
+
+        with self._lock:
+            if len(self._memory) >= self.max_memory_entries:
+                self._memory.clear()
+            self._memory[key] = highlighted
+        return highlighted
+
+    def _render(self, code, language):
+        from pygments import highlight
+        from pygments.lexers import get_lexer_by_name
+        from pygments.util import ClassNotFound
+
+        try:
+            lexer = get_lexer_by_name(language)
+        except ClassNotFound:
+            return None
+        return highlight(code, lexer, self.formatter)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,168 @@
+"""Image pre-render stage: downscale local images before wkhtmltopdf sees them.
+
+Local <img> references are rewritten to copies no wider than the printable
+page width at the target DPI. Processed images live in an on-disk cache keyed
+by the source content hash plus the target width, so identical images used by
+different documents are processed and stored once.
+"""
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from fileutil import atomic_path
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "md_to_pdf", "images")
+DEFAULT_DPI = 150
+# A4 (210mm) minus the 20mm left and right margins
+DEFAULT_CONTENT_WIDTH_MM = 170
+
+IMG_SRC_RE = re.compile(r'(<img\b[^>]*?\bsrc\s*=\s*)(["\'])(.*?)\2', re.IGNORECASE)
+# Markdown image targets: ![alt](src "title") and ![alt](<src with spaces>)
+MD_IMAGE_RE = re.compile(r'!\[[^\]]*\]\(\s*(?:<([^>]*)>|([^)\s]+))')
+# Reference definitions, e.g. "[logo]: images/logo.png", which ![alt][logo] may use
+MD_REFERENCE_RE = re.compile(r'^\s{0,3}\[[^\]]+\]:\s*<?([^>\s]+)>?', re.MULTILINE)
+
+
+def _require_pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError(
+            "Pillow is required for image downscaling. Install it with: pip install pillow"
+        )
+    return Image
+
+
+def local_image_path(src, base_dir):
+    """Resolve an <img> src to an existing local file, or None for remote/missing images."""
+    parsed = urlparse(src)
+    if parsed.scheme == 'file':
+        path = unquote(parsed.path)
+    elif parsed.scheme and len(parsed.scheme) > 1:
+        # http(s), data: and similar are left alone (single letters are Windows drives)
+        return None
+    else:
+        path = unquote(src)
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir or os.getcwd(), path)
+    return path if os.path.isfile(path) else None
+
+
+def find_local_images(html, base_dir):
+    """Return the local image files referenced by <img> tags in html, without duplicates."""
+    found = []
+    for match in IMG_SRC_RE.finditer(html):
+        path = local_image_path(match.group(3), base_dir)
+        if path is not None and path not in found:
+            found.append(path)
+    return found
+
+
+def find_markdown_images(content, base_dir):
+    """Return the local files a markdown source may embed as images, without rendering it.
+
+    Covers inline images, raw <img> tags and every reference definition that
+    points at a local file. It may list a few files that are only linked, never
+    one that is embedded.
+    """
+    sources = [match.group(1) or match.group(2) for match in MD_IMAGE_RE.finditer(content)]
+    sources += [match.group(1) for match in MD_REFERENCE_RE.finditer(content)]
+    sources += [match.group(3) for match in IMG_SRC_RE.finditer(content)]
+    found = []
+    for src in sources:
+        path = local_image_path(src, base_dir)
+        if path is not None and path not in found:
+            found.append(path)
+    return found
+
+
+class ImageAssetPipeline:
+    def __init__(self, cache_dir=None, dpi=DEFAULT_DPI, content_width_mm=DEFAULT_CONTENT_WIDTH_MM,
+                 jpeg_quality=85):
+        self.Image = _require_pillow()
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_width = int(content_width_mm / 25.4 * dpi)
+        self.jpeg_quality = jpeg_quality
+        self.processed = 0
+        self.reused = 0
+        self.skipped = 0
+        # (path, mtime, size) -> rewritten URI, so repeated images are not even re-hashed
+        self._resolved = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def process_html(self, html, base_dir):
+        """Rewrite local <img> sources in html; relative paths resolve against base_dir."""
+        def replace(match):
+            prefix, quote, src = match.groups()
+            path = local_image_path(src, base_dir)
+            if path is None:
+                return match.group(0)
+            try:
+                uri = self.prepare(path)
+            except Exception as e:
+                print(f"Error processing image {path}: {str(e)}")
+                return match.group(0)
+            return f"{prefix}{quote}{uri}{quote}"
+
+        return IMG_SRC_RE.sub(replace, html)
+
+    def prepare(self, path):
+        """Return a file URI for a page-sized version of the image at path."""
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            uri = self._resolved.get(memo_key)
+        if uri is not None:
+            self.reused += 1
+            return uri
+
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+
+        suffix = Path(path).suffix.lower() or '.png'
+        cached = os.path.join(self.cache_dir, digest[:2], f"{digest}-{self.max_width}{suffix}")
+        skip_marker = os.path.join(self.cache_dir, digest[:2], f"{digest}-{self.max_width}.small")
+
+        if os.path.exists(cached):
+            self.reused += 1
+            target = cached
+        elif os.path.exists(skip_marker):
+            self.skipped += 1
+            target = path
+        else:
+            target = self._downscale(path, cached, skip_marker)
+
+        uri = Path(target).resolve().as_uri()
+        with self._lock:
+            self._resolved[memo_key] = uri
+        return uri
+
+    def _downscale(self, path, cached, skip_marker):
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        with self.Image.open(path) as image:
+            if image.width <= self.max_width:
+                # Already small enough: remember that so the image is never decoded again
+                open(skip_marker, 'w').close()
+                self.skipped += 1
+                return path
+
+            height = max(1, round(image.height * self.max_width / image.width))
+            resized = image.resize((self.max_width, height), self.Image.LANCZOS)
+            save_options = {}
+            if image.format == 'JPEG':
+                save_options = {'quality': self.jpeg_quality, 'optimize': True}
+            elif image.format == 'PNG':
+                save_options = {'optimize': True}
+
+            with atomic_path(cached) as temp_path:
+                resized.save(temp_path, format=image.format, **save_options)
+
+        self.processed += 1
+        return cached
+
+    def stats(self):
+        return {'processed': self.processed, 'reused': self.reused, 'skipped': self.skipped}
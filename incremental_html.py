@@ -0,0 +1,197 @@
+"""Block-level memoization of the markdown to HTML stage.
+
+The source is split into top-level blocks and each block's HTML is cached by
+content hash, so re-rendering a document after a small edit only runs
+markdown2 on the blocks that changed.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import markdown2
+
+DEFAULT_MAX_BLOCKS = 4096
+
+FENCE_RE = re.compile(r'^\s{0,3}(```|~~~)')
+# Link and footnote definitions, e.g. "[id]: https://example.com" or "[^1]: note"
+DEFINITION_RE = re.compile(r'^\s{0,3}\[[^\]]+\]:\s*(\S*)')
+# A definition's title may be on the line after it, e.g. '  "Title"'
+DEFINITION_TITLE_RE = re.compile(r'^[ \t]*[\'"(].*[\'")][ \t]*$')
+LIST_ITEM_RE = re.compile(r'^\s{0,3}([-*+]|\d+[.)])\s')
+HTML_BLOCK_RE = re.compile(r'^<([a-zA-Z][a-zA-Z0-9]*)[\s>]')
+
+# Extras whose output depends on the whole document (numbering, ids, a TOC).
+# With any of these enabled the renderer falls back to a single full render.
+WHOLE_DOCUMENT_EXTRAS = {'footnotes', 'toc', 'header-ids', 'numbering'}
+
+
+def split_blocks(content):
+    """Split markdown into (blocks, definitions).
+
+    Blocks are separated by blank lines, except inside fenced code, raw HTML
+    blocks (up to the tag that closes the outermost one) and HTML comments,
+    and a blank line never splits a list, a blockquote or indented
+    continuation lines from the block they belong to. Link and footnote
+    definitions, with a URL or title on the following line, are returned
+    separately so they can be shared by every block.
+    """
+    blocks = []
+    definitions = []
+    current = []
+    fence = None
+    html_tag = None
+    html_depth = 0
+    in_comment = False
+    # While set, the next line may still continue the last definition
+    definition_needs = None
+    blank_seen = False
+
+    for line in content.splitlines():
+        stripped = line.strip()
+
+        if fence is not None:
+            current.append(line)
+            if stripped.startswith(fence):
+                fence = None
+            continue
+
+        if in_comment:
+            current.append(line)
+            if '-->' in line:
+                in_comment = False
+            continue
+
+        if html_tag is not None:
+            current.append(line)
+            html_depth += _tag_depth(html_tag, line)
+            if html_depth <= 0:
+                html_tag = None
+            continue
+
+        if not stripped:
+            definition_needs = None
+            if current:
+                blank_seen = True
+            continue
+
+        if definition_needs == 'url' and ' ' not in stripped:
+            definitions[-1] += '\n' + line
+            definition_needs = 'title'
+            continue
+        if definition_needs == 'title' and DEFINITION_TITLE_RE.match(line):
+            definitions[-1] += '\n' + line
+            definition_needs = None
+            continue
+        definition_needs = None
+
+        definition_match = DEFINITION_RE.match(line)
+        if definition_match:
+            definitions.append(line)
+            definition_needs = 'title' if definition_match.group(1) else 'url'
+            continue
+
+        if blank_seen and not _continues(current, line):
+            blocks.append('\n'.join(current))
+            current = []
+        elif blank_seen:
+            current.append('')
+        blank_seen = False
+
+        current.append(line)
+        fence_match = FENCE_RE.match(line)
+        if fence_match:
+            fence = fence_match.group(1)
+            continue
+        if line.startswith('<!--'):
+            in_comment = '-->' not in line[4:]
+            continue
+        html_match = HTML_BLOCK_RE.match(line)
+        if html_match:
+            tag = html_match.group(1).lower()
+            depth = _tag_depth(tag, line)
+            if depth > 0:
+                html_tag, html_depth = tag, depth
+
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks, definitions
+
+
+def _tag_depth(tag, line):
+    """Opening minus closing tags named tag on a line, so nested blocks of the same tag balance."""
+    lower = line.lower()
+    opens = len(re.findall(rf'<{tag}(?=[\s>]|$)', lower))
+    closes = len(re.findall(rf'</{tag}\s*>', lower))
+    return opens - closes
+
+
+def _continues(block_lines, line):
+    """Whether a line after a blank line still belongs to the previous block."""
+    if line[:1] in (' ', '\t'):
+        # Indented continuation of a list item or an indented code block
+        return True
+    first = block_lines[0]
+    if LIST_ITEM_RE.match(line) and any(LIST_ITEM_RE.match(l) for l in block_lines):
+        return True
+    if line.startswith('>') and first.startswith('>'):
+        return True
+    return False
+
+
+class IncrementalRenderer:
+    """Render markdown to HTML, reusing cached HTML for unchanged blocks.
+
+    By default blocks are rendered with markdown2 and the given extras; pass a
+    parser backend to render blocks with it instead.
+    """
+
+    def __init__(self, extras, max_blocks=DEFAULT_MAX_BLOCKS, backend=None):
+        self.extras = list(extras)
+        self.max_blocks = max_blocks
+        self.backend = backend
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _render_source(self, source):
+        if self.backend is not None:
+            return self.backend.render(source)
+        return markdown2.markdown(source, extras=self.extras)
+
+    def render(self, content):
+        if WHOLE_DOCUMENT_EXTRAS.intersection(self.extras):
+            return self._render_source(content)
+
+        blocks, definitions = split_blocks(content)
+        definitions_text = '\n'.join(definitions)
+        # Definitions are part of every key, so editing one re-renders the blocks using it
+        definitions_hash = hashlib.sha256(definitions_text.encode('utf-8')).hexdigest()
+
+        parts = []
+        for block in blocks:
+            # Only blocks that can reference a definition depend on them
+            uses_definitions = definitions and '[' in block
+            key = hashlib.sha256(block.encode('utf-8')).hexdigest()
+            if uses_definitions:
+                key += definitions_hash
+            with self._lock:
+                html = self._cache.get(key)
+                if html is not None:
+                    self.hits += 1
+                    self._cache.move_to_end(key)
+            if html is None:
+                source = block + '\n\n' + definitions_text if uses_definitions else block
+                html = self._render_source(source)
+                with self._lock:
+                    self.misses += 1
+                    self._cache[key] = html
+                    if len(self._cache) > self.max_blocks:
+                        self._cache.popitem(last=False)
+            parts.append(html)
+        return '\n'.join(parts)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
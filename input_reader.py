@@ -0,0 +1,136 @@
+"""Memory-bounded reading of markdown input with encoding detection.
+
+The file is memory-mapped and its encoding is sniffed from a bounded prefix:
+a byte order mark wins; otherwise NUL bytes suggest UTF-16, a prefix that is
+valid UTF-8 means UTF-8, and anything else is read as latin-1 (which decodes
+any byte sequence). The whole file is then decoded straight from the
+mapping, without reading it twice. A file whose prefix looked like UTF-8 but
+has invalid bytes further on is decoded again as latin-1, like the old
+read_file fallback; only a file whose BOM declares UTF-8/16/32 keeps that
+encoding, with U+FFFD for the bad bytes.
+
+Files larger than the maximum input size, or whose estimated conversion
+memory exceeds the memory budget, are rejected from their size alone before
+anything is read. Both limits default to the MD_TO_PDF_MAX_INPUT_MB and
+MD_TO_PDF_MEMORY_BUDGET_MB environment variables.
+"""
+import codecs
+import mmap
+import os
+
+# Bytes inspected to choose the encoding
+SNIFF_BYTES = 64 * 1024
+
+DEFAULT_MAX_INPUT_BYTES = int(float(os.environ.get('MD_TO_PDF_MAX_INPUT_MB', 64)) * 1024 * 1024)
+DEFAULT_MEMORY_BUDGET = int(float(os.environ.get('MD_TO_PDF_MEMORY_BUDGET_MB', 1024)) * 1024 * 1024)
+
+# Rough peak memory per input byte while converting: the decoded text, the
+# HTML rendered from it and the wrapped page all exist at the same time
+PEAK_MEMORY_FACTOR = 8
+
+# Checked in order: the UTF-32 marks start with the UTF-16 ones
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+class DecodedInput:
+    """Decoded markdown plus what was detected while reading it."""
+
+    def __init__(self, text, encoding, size, bom=False, replaced=False):
+        self.text = text
+        self.encoding = encoding
+        self.size = size
+        self.bom = bom
+        # True when invalid bytes were replaced with U+FFFD
+        self.replaced = replaced
+
+    def describe(self):
+        details = [self.encoding]
+        if self.bom:
+            details.append("BOM")
+        if self.replaced:
+            details.append("invalid bytes replaced")
+        return ", ".join(details)
+
+
+def sniff_encoding(prefix, final=False):
+    """Return (encoding, has_bom) for the first bytes of a file; final if prefix is the whole file."""
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding, True
+    if b'\x00' in prefix:
+        # Markdown is mostly ASCII, so UTF-16 without a BOM has a NUL in every other byte
+        even_nuls = prefix[0::2].count(0)
+        odd_nuls = prefix[1::2].count(0)
+        if even_nuls > odd_nuls:
+            return 'utf-16-be', False
+        if odd_nuls:
+            return 'utf-16-le', False
+    try:
+        # Unless this is the whole file, the prefix may end inside a character
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=final)
+        return 'utf-8', False
+    except UnicodeDecodeError:
+        return 'latin-1', False
+
+
+def check_limits(size, name, max_bytes=None, memory_budget=None):
+    """Raise ValueError if an input of size bytes is too large to convert."""
+    max_bytes = DEFAULT_MAX_INPUT_BYTES if max_bytes is None else max_bytes
+    memory_budget = DEFAULT_MEMORY_BUDGET if memory_budget is None else memory_budget
+    if max_bytes and size > max_bytes:
+        raise ValueError(f"{name} is {size / 1024 / 1024:.1f} MB, more than the maximum input size of "
+                         f"{max_bytes / 1024 / 1024:.1f} MB")
+    if memory_budget and size * PEAK_MEMORY_FACTOR > memory_budget:
+        raise ValueError(f"Converting {name} would need about {size * PEAK_MEMORY_FACTOR / 1024 / 1024:.0f} MB, "
+                         f"more than the memory budget of {memory_budget / 1024 / 1024:.0f} MB")
+
+
+def _normalize_newlines(text):
+    # Text-mode reads used to translate \r\n and \r to \n; keep doing that
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def decode_bytes(data):
+    """Decode a bytes-like object of markdown, detecting its encoding."""
+    encoding, bom = sniff_encoding(bytes(data[:SNIFF_BYTES]), final=len(data) <= SNIFF_BYTES)
+    replaced = False
+    try:
+        text = str(data, encoding)
+    except UnicodeDecodeError:
+        if bom:
+            # The file declared its encoding, so keep it and mark the bad bytes
+            text = str(data, encoding, 'replace')
+            replaced = True
+        else:
+            # A guess from the prefix was wrong; latin-1 decodes anything
+            encoding = 'latin-1'
+            text = str(data, encoding)
+    return DecodedInput(_normalize_newlines(text), encoding, len(data), bom=bom, replaced=replaced)
+
+
+def read_markdown(path, max_bytes=None, memory_budget=None):
+    """Memory-map path and decode it; returns a DecodedInput.
+
+    Raises ValueError before reading if the file exceeds max_bytes or the
+    memory budget.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        check_limits(size, path, max_bytes, memory_budget)
+        if size == 0:
+            # Empty files cannot be mapped
+            return DecodedInput("", 'utf-8', 0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return decode_bytes(view)
+            finally:
+                view.release()
@@ -0,0 +1,158 @@
+"""Per-stage instrumentation for MarkdownConverter.
+
+The converter announces the start and end of every stage (reading, markdown,
+wkhtmltopdf, ...) to its observers. An observer is any object with some of
+on_stage_start(event), on_stage_end(event) and on_status(message, progress);
+ConversionObserver provides no-op defaults for all three.
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then reported as None
+    resource = None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def cpu_seconds():
+    """CPU time of this process plus finished child processes (e.g. wkhtmltopdf)."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class StageEvent:
+    def __init__(self, stage, input_file=None, message=None, progress=None, bytes_in=None):
+        self.stage = stage
+        self.input_file = input_file
+        self.message = message
+        self.progress = progress
+        self.bytes_in = bytes_in
+        self.bytes_out = None
+        self.started_at = time.time()
+        self.wall_time = None
+        self.cpu_time = None
+        self.peak_rss = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            'stage': self.stage,
+            'input_file': self.input_file,
+            'started_at': self.started_at,
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'peak_rss': self.peak_rss,
+            'error': self.error,
+        }
+
+
+class ConversionObserver:
+    def on_stage_start(self, event):
+        pass
+
+    def on_stage_end(self, event):
+        pass
+
+    def on_status(self, message, progress):
+        pass
+
+
+class GuiProgressObserver(ConversionObserver):
+    """Drive the ConverterGUI status label and progress bar from converter events."""
+
+    def __init__(self, gui):
+        self.gui = gui
+
+    def on_stage_start(self, event):
+        if event.message is not None:
+            self.on_status(event.message, event.progress)
+
+    def on_status(self, message, progress):
+        self.gui.show_status(message)
+        if progress is not None:
+            self.gui.update_progress(progress)
+
+
+class JsonLinesTraceSink(ConversionObserver):
+    """Append one JSON object per finished stage to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def on_stage_end(self, event):
+        line = json.dumps(event.to_dict())
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def load_trace(path):
+    """Read the events written by a JsonLinesTraceSink."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class StageStatistics(ConversionObserver):
+    """Aggregate stage wall times and report percentiles per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wall_times = {}
+        self.cpu_times = {}
+
+    def on_stage_end(self, event):
+        with self._lock:
+            self.wall_times.setdefault(event.stage, []).append(event.wall_time)
+            self.cpu_times.setdefault(event.stage, []).append(event.cpu_time)
+
+    def add_events(self, events):
+        """Add finished events given as dicts, e.g. read back from a trace file."""
+        with self._lock:
+            for event in events:
+                self.wall_times.setdefault(event['stage'], []).append(event['wall_time'])
+                self.cpu_times.setdefault(event['stage'], []).append(event['cpu_time'])
+
+    def report(self):
+        """Return a text table of count, total and p50/p90/p99/max wall time per stage."""
+        lines = [f"{'stage':<14} {'count':>6} {'total s':>9} {'p50 ms':>9} {'p90 ms':>9} "
+                 f"{'p99 ms':>9} {'max ms':>9} {'cpu s':>8}"]
+        with self._lock:
+            stages = sorted(self.wall_times.items(), key=lambda item: -sum(item[1]))
+            for stage, values in stages:
+                values = sorted(values)
+                cpu_total = sum(self.cpu_times.get(stage, []))
+                lines.append(
+                    f"{stage:<14} {len(values):>6} {sum(values):>9.2f} "
+                    f"{percentile(values, 0.5) * 1000:>9.1f} {percentile(values, 0.9) * 1000:>9.1f} "
+                    f"{percentile(values, 0.99) * 1000:>9.1f} {values[-1] * 1000:>9.1f} {cpu_total:>8.2f}"
+                )
+        return "\n".join(lines)
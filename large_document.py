@@ -0,0 +1,182 @@
+"""Large-document mode: split at top-level headings and render shards in parallel.
+
+The input is streamed line by line, so only one shard per worker is held in
+memory at a time. The shard PDFs are merged with pypdf, keeping each shard's
+outline (bookmarks), and page numbers are stamped across the merged document
+so numbering stays continuous.
+"""
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pdfkit
+
+from converter import MarkdownConverter
+from fileutil import atomic_path, require_pypdf
+from input_reader import SNIFF_BYTES, sniff_encoding
+
+DEFAULT_SHARD_BYTES = 256 * 1024
+
+FENCE_RE = re.compile(r'^\s{0,3}(```|~~~)')
+HEADING_RE = re.compile(r'^#\s')
+# Reference-style link definitions, e.g. "[id]: https://example.com"
+REFERENCE_RE = re.compile(r'^\s{0,3}\[[^\]]+\]:\s*\S')
+
+PAGE_NUMBER_FOOTER = '[page] / [topage]'
+
+_worker_converter = None
+
+
+def _scan_references(input_file, encoding, errors='strict'):
+    references = []
+    with open(input_file, 'r', encoding=encoding, errors=errors) as f:
+        in_fence = False
+        for line in f:
+            if FENCE_RE.match(line):
+                in_fence = not in_fence
+            elif not in_fence and REFERENCE_RE.match(line):
+                references.append(line.rstrip('\n'))
+    return references
+
+
+def detect_encoding_and_references(input_file):
+    """Stream the file once, returning its encoding and all link definitions.
+
+    The encoding is sniffed like MarkdownConverter.read_file does (see
+    input_reader.py). Link definitions are appended to every shard so
+    reference-style links keep resolving after the document is split.
+    """
+    with open(input_file, 'rb') as f:
+        prefix = f.read(SNIFF_BYTES + 1)
+    encoding, bom = sniff_encoding(prefix[:SNIFF_BYTES], final=len(prefix) <= SNIFF_BYTES)
+    if bom:
+        # A declared encoding is kept; invalid bytes become U+FFFD
+        return encoding, _scan_references(input_file, encoding, 'replace')
+    try:
+        return encoding, _scan_references(input_file, encoding)
+    except UnicodeDecodeError:
+        # The prefix looked like UTF-8 but the rest is not; latin-1 decodes anything
+        return 'latin-1', _scan_references(input_file, 'latin-1')
+
+
+def iter_shards(input_file, target_bytes=DEFAULT_SHARD_BYTES, encoding='utf-8'):
+    """Yield markdown shards split at top-level headings outside code fences.
+
+    Consecutive sections are grouped until a shard reaches target_bytes, so a
+    document with many short chapters does not spawn one wkhtmltopdf per chapter.
+    """
+    lines = []
+    size = 0
+    in_fence = False
+    # The encoding was validated by detect_encoding_and_references; 'replace' only
+    # matters for files whose BOM declared an encoding they do not follow
+    with open(input_file, 'r', encoding=encoding, errors='replace') as f:
+        for line in f:
+            if FENCE_RE.match(line):
+                in_fence = not in_fence
+            elif not in_fence and HEADING_RE.match(line) and size >= target_bytes and lines:
+                yield ''.join(lines)
+                lines = []
+                size = 0
+            lines.append(line)
+            size += len(line)
+    if lines:
+        yield ''.join(lines)
+
+
+def _make_converter(parser=None, highlight_style=None, theme=None, theme_file=None, asset_dir=None):
+    highlighter = None
+    if highlight_style:
+        from highlight import CodeHighlighter
+        highlighter = CodeHighlighter(highlight_style)
+    return MarkdownConverter(parser=parser, highlighter=highlighter, theme=theme, theme_file=theme_file,
+                             asset_dir=asset_dir)
+
+
+def _init_worker(parser=None, highlight_style=None, theme=None, theme_file=None, asset_dir=None):
+    """Create the converter used by this worker process, with the same settings as the parent."""
+    global _worker_converter
+    _worker_converter = _make_converter(parser, highlight_style, theme, theme_file, asset_dir)
+
+
+def _render_shard(index, markdown_text, references, title, temp_dir):
+    """Render one shard to a PDF file inside a worker process."""
+    if references:
+        markdown_text = markdown_text + '\n\n' + '\n'.join(references) + '\n'
+    body = _worker_converter.highlight_code(_worker_converter.markdown_to_html(markdown_text))
+    html = _worker_converter.wrap_html(body, title)
+    output_file = os.path.join(temp_dir, f"shard-{index:05d}.pdf")
+    pdfkit.from_string(html, output_file, **_worker_converter.pdfkit_kwargs())
+    if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+        raise RuntimeError(f"Shard {index} was not rendered")
+    return index, output_file
+
+
+def _render_page_numbers(converter, page_count, output_file):
+    """Render blank pages that only carry the page-number footer, used as an overlay."""
+    pages = '<div style="page-break-after: always">&nbsp;</div>' * (page_count - 1) + '<div>&nbsp;</div>'
+    html = f'<!DOCTYPE html><html><head><meta charset="utf-8"></head><body>{pages}</body></html>'
+    kwargs = converter.pdfkit_kwargs()
+    kwargs['options'].update({
+        'footer-center': PAGE_NUMBER_FOOTER,
+        'footer-font-size': '9',
+        'no-outline': '',
+    })
+    pdfkit.from_string(html, output_file, **kwargs)
+
+
+def convert_large_document(input_file, output_file, jobs=None, shard_bytes=DEFAULT_SHARD_BYTES,
+                           page_numbers=True, parser=None, highlight_style=None, theme=None, theme_file=None,
+                           asset_dir=None):
+    """Convert a very large markdown file by rendering shards in parallel and merging them."""
+    pypdf = require_pypdf("for large-document mode")
+    # Fails early on unknown parsers, styles or themes; the page-number overlay uses its page setup
+    converter = _make_converter(parser, highlight_style, theme, theme_file, asset_dir)
+    converter.check_dependencies()
+    jobs = jobs or os.cpu_count() or 1
+    title = os.path.splitext(os.path.basename(input_file))[0]
+    start = time.perf_counter()
+
+    encoding, references = detect_encoding_and_references(input_file)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        shard_files = {}
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(parser, highlight_style, theme, theme_file, asset_dir)) as pool:
+            pending = set()
+            for index, shard in enumerate(iter_shards(input_file, shard_bytes, encoding)):
+                # Keep a bounded number of shards in flight so memory stays flat
+                if len(pending) >= jobs * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finished, path = future.result()
+                        shard_files[finished] = path
+                pending.add(pool.submit(_render_shard, index, shard, references, title, temp_dir))
+            for future in pending:
+                finished, path = future.result()
+                shard_files[finished] = path
+
+        print(f"Rendered {len(shard_files)} shards, merging...")
+        writer = pypdf.PdfWriter()
+        for index in sorted(shard_files):
+            # import_outline keeps each shard's heading bookmarks, shifted to the merged pages
+            writer.append(shard_files[index], import_outline=True)
+
+        if page_numbers and len(writer.pages):
+            numbers_file = os.path.join(temp_dir, "page-numbers.pdf")
+            _render_page_numbers(converter, len(writer.pages), numbers_file)
+            numbers = pypdf.PdfReader(numbers_file)
+            for page, overlay in zip(writer.pages, numbers.pages):
+                page.merge_page(overlay)
+
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        os.makedirs(output_dir, exist_ok=True)
+        with atomic_path(output_file) as temp_pdf:
+            with open(temp_pdf, 'wb') as f:
+                writer.write(f)
+
+    elapsed = time.perf_counter() - start
+    print(f"Converted {input_file} ({len(shard_files)} shards) to {output_file} in {elapsed:.2f}s")
+    return True
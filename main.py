@@ -1,8 +1,9 @@
 from gui import ConverterGUI
 from converter import MarkdownConverter
+from conversion_queue import ConversionQueue, FINISHED
 from tkinter import filedialog, messagebox
 import os
-import threading
+import tkinter as tk
 import webbrowser
 
 
@@ -15,145 +16,153 @@ class MarkdownConverterApp:
         self.gui = ConverterGUI()
         self.converter = MarkdownConverter(self.gui)
         self.gui.convert_btn.config(command=self.select_files)
+        self.gui.folder_btn.config(command=self.select_folder)
+        self.gui.workers_spin.config(command=self.update_workers)
+        self.gui.cancel_selected_btn.config(command=self.cancel_selected)
 
         # Add cancel button support
         if hasattr(self.gui, 'cancel_btn'):
             self.gui.cancel_btn.config(command=self.cancel_conversion)
 
+        # Files are converted by a pool of worker threads, each with its own converter
+        self.queue = ConversionQueue(workers=self.get_workers(), on_change=self.on_item_changed)
         self.conversion_in_progress = False
-        self.conversion_thread = None
 
-    def cancel_conversion(self):
-        """Cancel the ongoing conversion process."""
-        if self.conversion_in_progress:
-            self.conversion_in_progress = False
-            self.gui.status_label.config(text="Conversion cancelled")
-            self.gui.progress['value'] = 0
-            self.gui.convert_btn.config(state='normal')
-            if hasattr(self.gui, 'cancel_btn'):
-                self.gui.cancel_btn.config(state='disabled')
-
-            # Signal to converter to stop
-            if hasattr(self.converter, 'cancel'):
-                self.converter.cancel()
-
-    def run_conversion(self, input_file, output_file):
-        """Run the conversion process in a separate thread."""
+    def get_workers(self):
+        """Number of parallel conversions chosen in the UI."""
         try:
-            success = self.converter.convert(input_file, output_file)
-
-            if not success:
-                self.gui.status_label.config(text="Conversion failed or was cancelled")
+            return max(1, int(self.gui.workers_var.get()))
+        except (ValueError, tk.TclError):
+            return 1
 
-        except Exception as e:
-            # This will catch any exceptions that weren't handled in the converter
-            error_msg = f"Error: {str(e)}"
-            print(error_msg)
-            self.gui.status_label.config(text=error_msg)
-            messagebox.showerror("Conversion Error", f"An unexpected error occurred: {str(e)}")
-
-        finally:
-            # Always make sure to reset the UI state
-            self.conversion_in_progress = False
-            self.gui.convert_btn.config(state='normal')
-            if hasattr(self.gui, 'cancel_btn'):
-                self.gui.cancel_btn.config(state='disabled')
+    def update_workers(self):
+        self.queue.set_workers(self.get_workers())
 
-    def select_files(self):
-        """Handle file selection and start the conversion process."""
+    def cancel_conversion(self):
+        """Cancel every queued and running conversion."""
         if self.conversion_in_progress:
+            self.queue.cancel_all()
+
+    def cancel_selected(self):
+        """Cancel the conversions selected in the file list."""
+        items = {str(item.id): item for item in self.queue.items}
+        for key in self.gui.selected_file_keys():
+            if key in items:
+                self.queue.cancel(items[key])
+
+    def on_item_changed(self, item):
+        """Report a queue item's state; called from worker threads."""
+        self.gui.channel.post(message=item.message, key=item.id)
+
+        counts = self.queue.counts()
+        total = sum(counts.values())
+        finished = sum(counts[status] for status in FINISHED)
+        if finished < total:
+            message = (f"Converting {finished}/{total} files finished, {counts['running']} running, "
+                       f"{counts['failed']} failed")
+            self.gui.channel.post(message=message, progress=self.queue.overall_progress())
             return
 
+        message = f"Converted {counts['done']}/{total} files"
+        if counts['failed']:
+            message += f", {counts['failed']} failed"
+        if counts['cancelled']:
+            message += f", {counts['cancelled']} cancelled"
+        self.gui.channel.post(message=message, progress=100)
+        self.gui.run_on_ui_thread(self.finish_conversion)
+
+    def finish_conversion(self):
+        """Reset the buttons once the queue is empty (runs on the Tk thread)."""
+        if not self.queue.idle:
+            return
+        self.conversion_in_progress = False
+        if hasattr(self.gui, 'cancel_btn'):
+            self.gui.cancel_btn.config(state='disabled')
+        self.gui.cancel_selected_btn.config(state='disabled')
+
+    def check_wkhtmltopdf(self):
+        """Offer the download page if wkhtmltopdf is missing; True if conversion can start."""
+        if self.converter.wkhtmltopdf_path:
+            return True
+        if messagebox.askyesno("Dependency Missing",
+                               "wkhtmltopdf not found, which is required for PDF conversion.\n\n"
+                               "Would you like to open the download page?"):
+            webbrowser.open("https://wkhtmltopdf.org/downloads.html")
+        return False
+
+    def select_files(self):
+        """Queue one or more markdown files; each PDF is saved next to its source."""
         try:
-            # Check for wkhtmltopdf before starting
-            if not self.converter.wkhtmltopdf_path:
-                if messagebox.askyesno("Dependency Missing",
-                                       "wkhtmltopdf not found, which is required for PDF conversion.\n\n"
-                                       "Would you like to open the download page?"):
-                    webbrowser.open("https://wkhtmltopdf.org/downloads.html")
+            if not self.check_wkhtmltopdf():
                 return
 
-            self.gui.status_label.config(text="Selecting files...")
-            self.gui.progress['value'] = 0
-            self.gui.root.update()
-
-            input_file = filedialog.askopenfilename(
-                title="Select Markdown file",
+            input_files = filedialog.askopenfilenames(
+                title="Select Markdown files",
                 filetypes=[("Markdown files", "*.md"), ("Text files", "*.txt"), ("All files", "*.*")]
             )
 
-            if not input_file:
-                self.gui.status_label.config(text="No input file selected")
+            if not input_files:
+                self.gui.show_status("No input file selected")
                 return
 
-            # Validate file exists and is readable
-            if not os.path.isfile(input_file):
-                raise ConversionError("Input file does not exist")
+            self.enqueue([(input_file, os.path.basename(input_file)) for input_file in input_files])
 
-            if not os.access(input_file, os.R_OK):
-                raise ConversionError(f"Cannot read input file: {input_file}")
+        except Exception as e:
+            messagebox.showerror("Error", f"An unexpected error occurred: {str(e)}")
+            self.gui.show_status("Operation failed!")
 
-            # Default output filename based on input filename
-            default_output = os.path.splitext(input_file)[0] + ".pdf"
+    def select_folder(self):
+        """Queue every markdown file below a folder; each PDF is saved next to its source."""
+        from batch import find_markdown_files
 
-            output_file = filedialog.asksaveasfilename(
-                title="Save PDF as",
-                defaultextension=".pdf",
-                initialfile=os.path.basename(default_output),
-                filetypes=[("PDF files", "*.pdf")]
-            )
+        try:
+            if not self.check_wkhtmltopdf():
+                return
 
-            if not output_file:
-                self.gui.status_label.config(text="Conversion cancelled")
+            folder = filedialog.askdirectory(title="Select a folder of Markdown files")
+            if not folder:
+                self.gui.show_status("No folder selected")
                 return
 
-            # Print paths for debugging
-            print(f"Input file: {input_file}")
-            print(f"Output file: {output_file}")
-
-            if output_file:  # Ensure output_file is defined
-                # Check if output directory is writable
-                output_dir = os.path.dirname(os.path.abspath(output_file))
-                if not os.path.exists(output_dir):
-                    try:
-                        os.makedirs(output_dir, exist_ok=True)  # Use exist_ok to avoid race condition
-                    except Exception as e:
-                        raise ConversionError(f"Cannot create output directory: {output_dir}. Error: {str(e)}")
-
-                if not os.access(output_dir, os.W_OK):
-                    raise ConversionError(f"Cannot write to output directory: {output_dir}")
-
-            # Disable the convert button and enable the cancel button during conversion
-            self.conversion_in_progress = True
-            self.gui.convert_btn.config(state='disabled')
-            if hasattr(self.gui, 'cancel_btn'):
-                self.gui.cancel_btn.config(state='normal')
-
-            # Start conversion in a separate thread to avoid freezing the UI
-            self.conversion_thread = threading.Thread(
-                target=self.run_conversion,
-                args=(input_file, output_file)
-            )
-            self.conversion_thread.daemon = True
-            self.conversion_thread.start()
+            if not os.path.isdir(folder):
+                raise ConversionError(f"Folder does not exist: {folder}")
+
+            input_files = find_markdown_files(folder)
+            if not input_files:
+                self.gui.show_status(f"No markdown files found in {folder}")
+                return
+
+            self.enqueue([(input_file, os.path.relpath(input_file, folder)) for input_file in input_files])
 
         except ConversionError as e:
             messagebox.showerror("Conversion Error", str(e))
-            self.gui.status_label.config(text="Conversion failed!")
-            self.gui.progress['value'] = 0
-            self.conversion_in_progress = False
-            self.gui.convert_btn.config(state='normal')
-            if hasattr(self.gui, 'cancel_btn'):
-                self.gui.cancel_btn.config(state='disabled')
+            self.gui.show_status("Conversion failed!")
 
         except Exception as e:
             messagebox.showerror("Error", f"An unexpected error occurred: {str(e)}")
-            self.gui.status_label.config(text="Operation failed!")
-            self.gui.progress['value'] = 0
-            self.conversion_in_progress = False
-            self.gui.convert_btn.config(state='normal')
-            if hasattr(self.gui, 'cancel_btn'):
-                self.gui.cancel_btn.config(state='disabled')
+            self.gui.show_status("Operation failed!")
+
+    def enqueue(self, files):
+        """Add (input_file, display_name) pairs to the conversion queue."""
+        if self.queue.idle:
+            # A new batch: drop the rows of the previous one so totals start fresh
+            for item in self.queue.clear_finished():
+                if self.gui.file_list.exists(str(item.id)):
+                    self.gui.file_list.delete(str(item.id))
+            self.gui.update_progress(0)
+
+        self.update_workers()
+        self.conversion_in_progress = True
+        if hasattr(self.gui, 'cancel_btn'):
+            self.gui.cancel_btn.config(state='normal')
+        self.gui.cancel_selected_btn.config(state='normal')
+
+        for input_file, name in files:
+            output_file = os.path.splitext(input_file)[0] + ".pdf"
+            print(f"Queued {input_file} -> {output_file}")
+            item = self.queue.add(input_file, output_file)
+            # Worker updates are applied on a later frame, so the row exists by then
+            self.gui.add_file_row(item.id, name, item.message)
 
     def run(self):
         """Start the application."""
@@ -172,4 +181,4 @@ class MarkdownConverterApp:
 
 if __name__ == "__main__":
     app = MarkdownConverterApp()
-    app.run()
\ No newline at end of file
+    app.run()
@@ -0,0 +1,554 @@
+"""Command line entry point: python -m md_to_pdf <command> ..."""
+import argparse
+import os
+import sys
+
+
+def run_batch_command(args):
+    """Convert a whole directory tree without the GUI."""
+    from batch import run_batch
+    from parsers import get_backend
+
+    if not os.path.isdir(args.src_dir):
+        print(f"Error: source directory does not exist: {args.src_dir}")
+        return 2
+    try:
+        # Fail here rather than once per worker process
+        get_backend(args.parser)
+        if args.highlight:
+            from highlight import CodeHighlighter
+            CodeHighlighter(args.highlight)
+        from config import get_theme
+        get_theme(args.theme, args.theme_file, args.asset_dir)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    cache_max_bytes = args.cache_size * 1024 * 1024 if args.cache_size else None
+    result = run_batch(args.src_dir, args.out_dir, jobs=args.jobs,
+                       cache_dir=args.cache_dir, cache_max_bytes=cache_max_bytes,
+                       in_memory=args.in_memory, image_dpi=args.image_dpi,
+                       image_cache_dir=args.image_cache_dir, trace_path=args.trace,
+                       parser=args.parser, highlight_style=args.highlight, profile=args.profile,
+                       theme=args.theme, theme_file=args.theme_file, asset_dir=args.asset_dir)
+    print()
+    print(result.summary())
+    if args.trace:
+        print()
+        print_trace_report(args.trace)
+    return 1 if result.failures else 0
+
+
+def print_trace_report(trace_path):
+    from instrumentation import StageStatistics, load_trace
+
+    statistics = StageStatistics()
+    statistics.add_events(load_trace(trace_path))
+    print(statistics.report())
+
+
+def run_trace_report_command(args):
+    """Print per-stage percentiles from a JSON-lines trace file."""
+    if not os.path.isfile(args.trace_file):
+        print(f"Error: trace file does not exist: {args.trace_file}")
+        return 2
+    print_trace_report(args.trace_file)
+    return 0
+
+
+def run_rebuild_command(args):
+    """Rebuild only the PDFs whose sources, images or settings changed."""
+    from build_db import run_rebuild
+
+    if not os.path.isdir(args.src_dir):
+        print(f"Error: source directory does not exist: {args.src_dir}")
+        return 2
+
+    try:
+        result = run_rebuild(args.src_dir, args.out_dir, jobs=args.jobs, parser=args.parser,
+                             image_dpi=args.image_dpi, image_cache_dir=args.image_cache_dir,
+                             dry_run=args.dry_run, profile=args.profile)
+    except RuntimeError as e:
+        print(f"Error: {str(e)}")
+        return 1
+    print()
+    print(result.summary())
+    return 1 if result.failures else 0
+
+
+def run_watch_command(args):
+    """Rebuild PDFs whenever markdown files below a directory change."""
+    from watch import DirectoryWatcher
+
+    if not os.path.isdir(args.src_dir):
+        print(f"Error: source directory does not exist: {args.src_dir}")
+        return 2
+
+    watcher = DirectoryWatcher(args.src_dir, args.out_dir, interval=args.interval,
+                               debounce=args.debounce, jobs=args.jobs)
+    watcher.run()
+    return 0
+
+
+def run_serve_command(args):
+    """Run the local HTTP conversion service."""
+    from server import serve
+
+    try:
+        serve(host=args.host, port=args.port, workers=args.workers,
+              queue_size=args.queue_size, sync_limit=args.sync_limit * 1024,
+              theme=args.theme, theme_file=args.theme_file, asset_dir=args.asset_dir)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+    return 0
+
+
+def run_large_command(args):
+    """Convert one very large document by rendering shards in parallel."""
+    from large_document import convert_large_document
+
+    if not os.path.isfile(args.input_file):
+        print(f"Error: input file does not exist: {args.input_file}")
+        return 2
+
+    try:
+        convert_large_document(args.input_file, args.output_file, jobs=args.jobs,
+                               shard_bytes=args.shard_size * 1024,
+                               page_numbers=not args.no_page_numbers, parser=args.parser,
+                               highlight_style=args.highlight, theme=args.theme, theme_file=args.theme_file,
+                               asset_dir=args.asset_dir)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+    return 0
+
+
+def run_book_command(args):
+    """Convert an ordered manifest of chapters into one PDF."""
+    from book import build_book
+    from converter import MarkdownConverter
+
+    if not os.path.exists(args.manifest):
+        print(f"Error: manifest does not exist: {args.manifest}")
+        return 2
+
+    try:
+        build_book(args.manifest, args.output_file, toc=args.toc, outline=not args.no_outline,
+                   outline_depth=args.outline_depth, title=args.title,
+                   converter=MarkdownConverter(parser=args.parser))
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+    return 0
+
+
+def run_preview_command(args):
+    """Render a quick draft of a document and report how long it took."""
+    from converter import MarkdownConverter
+
+    if not os.path.isfile(args.input_file):
+        print(f"Error: input file does not exist: {args.input_file}")
+        return 2
+
+    converter = MarkdownConverter(parser=args.parser)
+    try:
+        latency = converter.preview(args.input_file, args.output_file, pages=args.pages, section=args.section)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+    print(f"Preview written to {args.output_file} in {latency * 1000:.0f}ms")
+    return 0
+
+
+def run_coordinate_command(args):
+    """Queue a directory tree in a spool directory and report progress until it is converted."""
+    from spool import run_coordinator
+
+    if not os.path.isdir(args.src_dir):
+        print(f"Error: source directory does not exist: {args.src_dir}")
+        return 2
+
+    worker_args = []
+    if args.parser:
+        worker_args += ['--parser', args.parser]
+    if args.profile:
+        worker_args += ['--profile', args.profile]
+    _, failed = run_coordinator(args.src_dir, args.out_dir, args.spool_dir, local_workers=args.workers,
+                                lease=args.lease, max_attempts=args.max_attempts, interval=args.interval,
+                                worker_args=worker_args)
+    return 1 if failed else 0
+
+
+def run_worker_command(args):
+    """Convert jobs from a spool directory shared with other workers."""
+    from converter import MarkdownConverter
+    from spool import SpoolWorker
+
+    try:
+        converter = MarkdownConverter(parser=args.parser, profile=args.profile)
+        converter.check_dependencies()
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+    worker = SpoolWorker(args.spool_dir, lease=args.lease, poll=args.poll, converter=converter)
+    worker.run(exit_when_idle=args.exit_when_idle)
+    return 1 if worker.failed else 0
+
+
+def print_startup_profile():
+    """Print how long the heavy imports and wkhtmltopdf discovery take."""
+    import importlib
+    import time
+
+    timings = []
+    for module in ("converter", "markdown2", "pdfkit"):
+        start = time.perf_counter()
+        importlib.import_module(module)
+        timings.append((f"import {module}", time.perf_counter() - start))
+
+    from converter import MarkdownConverter
+
+    start = time.perf_counter()
+    converter = MarkdownConverter()
+    source = "stamp" if converter.discovery_from_stamp else "probe"
+    timings.append((f"wkhtmltopdf discovery ({source})", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    converter.get_wkhtmltopdf_version()
+    timings.append(("wkhtmltopdf version", time.perf_counter() - start))
+
+    print("Startup profile:")
+    for name, elapsed in timings:
+        print(f"  {name:<32} {elapsed * 1000:8.1f} ms")
+    print(f"  {'total':<32} {sum(t for _, t in timings) * 1000:8.1f} ms")
+
+
+def build_parser():
+    from output_profiles import OUTPUT_PROFILES
+    from parsers import BACKENDS
+
+    parser = argparse.ArgumentParser(
+        prog="md_to_pdf",
+        description="Convert Markdown files to PDF"
+    )
+    parser.add_argument(
+        "--startup-profile", action="store_true",
+        help="Print import and wkhtmltopdf discovery timings"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Convert every markdown file below a directory, mirroring the layout"
+    )
+    batch_parser.add_argument("src_dir", help="Directory to search for .md files")
+    batch_parser.add_argument("out_dir", help="Directory to write the PDFs to")
+    batch_parser.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help="Number of worker processes (default: number of CPU cores)"
+    )
+    batch_parser.add_argument(
+        "--cache-dir", default=None,
+        help="Reuse PDFs for unchanged inputs from this cache directory"
+    )
+    batch_parser.add_argument(
+        "--cache-size", type=int, default=None,
+        help="Maximum cache size in MB before least recently used PDFs are evicted (default: 512)"
+    )
+    batch_parser.add_argument(
+        "--in-memory", action="store_true",
+        help="Pipe HTML to wkhtmltopdf over stdin/stdout instead of using temp files"
+    )
+    batch_parser.add_argument(
+        "--image-dpi", type=int, default=None,
+        help="Downscale local images to the page width at this DPI (requires Pillow)"
+    )
+    batch_parser.add_argument(
+        "--image-cache-dir", default=None,
+        help="Where downscaled images are cached (default: ~/.cache/md_to_pdf/images)"
+    )
+    batch_parser.add_argument(
+        "--trace", default=None,
+        help="Write per-stage timings as JSON lines to this file and print a percentile report"
+    )
+    batch_parser.add_argument(
+        "--parser", choices=sorted(BACKENDS), default=None,
+        help="Markdown parser backend (default: markdown2, or $MD_TO_PDF_PARSER)"
+    )
+    batch_parser.add_argument(
+        "--highlight", nargs="?", const="default", default=None, metavar="STYLE",
+        help="Syntax-highlight fenced code blocks with this Pygments style (default style: 'default')"
+    )
+    batch_parser.add_argument(
+        "--profile", choices=sorted(OUTPUT_PROFILES), default=None,
+        help="Output size profile: image DPI/quality and a PDF optimization pass (requires pypdf)"
+    )
+    batch_parser.add_argument(
+        "--theme", default=None,
+        help="Page theme: CSS, page size, margins, header and footer (default: 'default')"
+    )
+    batch_parser.add_argument(
+        "--theme-file", default=None,
+        help="JSON file defining additional themes"
+    )
+    batch_parser.add_argument(
+        "--asset-dir", default=None,
+        help="Write the theme's stylesheet and fonts here once and link them instead of inlining"
+    )
+    batch_parser.set_defaults(func=run_batch_command)
+
+    rebuild_parser = subparsers.add_parser(
+        "rebuild",
+        help="Incrementally rebuild a directory using a build database in the output directory"
+    )
+    rebuild_parser.add_argument("src_dir", help="Directory to search for .md files")
+    rebuild_parser.add_argument("out_dir", help="Directory to write the PDFs to")
+    rebuild_parser.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help="Number of worker processes (default: number of CPU cores)"
+    )
+    rebuild_parser.add_argument(
+        "--image-dpi", type=int, default=None,
+        help="Downscale local images to the page width at this DPI (requires Pillow)"
+    )
+    rebuild_parser.add_argument(
+        "--image-cache-dir", default=None,
+        help="Where downscaled images are cached (default: ~/.cache/md_to_pdf/images)"
+    )
+    rebuild_parser.add_argument(
+        "--parser", choices=sorted(BACKENDS), default=None,
+        help="Markdown parser backend (default: markdown2, or $MD_TO_PDF_PARSER)"
+    )
+    rebuild_parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Only list the files that would be rebuilt or removed"
+    )
+    rebuild_parser.add_argument(
+        "--profile", choices=sorted(OUTPUT_PROFILES), default=None,
+        help="Output size profile: image DPI/quality and a PDF optimization pass (requires pypdf)"
+    )
+    rebuild_parser.set_defaults(func=run_rebuild_command)
+
+    watch_parser = subparsers.add_parser(
+        "watch",
+        help="Watch a directory and rebuild PDFs for changed markdown files"
+    )
+    watch_parser.add_argument("src_dir", help="Directory to watch for .md files")
+    watch_parser.add_argument("out_dir", help="Directory to write the PDFs to")
+    watch_parser.add_argument(
+        "--interval", type=float, default=0.5,
+        help="Seconds between polls of the source tree (default: 0.5)"
+    )
+    watch_parser.add_argument(
+        "--debounce", type=float, default=0.3,
+        help="Seconds a file must be unchanged before it is rebuilt (default: 0.3)"
+    )
+    watch_parser.add_argument(
+        "--jobs", "-j", type=int, default=2,
+        help="Number of files rendered in parallel (default: 2)"
+    )
+    watch_parser.set_defaults(func=run_watch_command)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Run a local HTTP service that converts POSTed markdown to PDF"
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    serve_parser.add_argument(
+        "--workers", type=int, default=2,
+        help="Number of concurrent wkhtmltopdf conversions (default: 2)"
+    )
+    serve_parser.add_argument(
+        "--queue-size", type=int, default=32,
+        help="Jobs that may wait before requests are rejected with 429 (default: 32)"
+    )
+    serve_parser.add_argument(
+        "--sync-limit", type=int, default=256,
+        help="Documents larger than this many KB get a job id instead of the PDF (default: 256)"
+    )
+    serve_parser.add_argument(
+        "--theme", default=None,
+        help="Page theme: CSS, page size, margins, header and footer (default: 'default')"
+    )
+    serve_parser.add_argument(
+        "--theme-file", default=None,
+        help="JSON file defining additional themes"
+    )
+    serve_parser.add_argument(
+        "--asset-dir", default=None,
+        help="Write the theme's stylesheet and fonts here once and link them instead of inlining"
+    )
+    serve_parser.set_defaults(func=run_serve_command)
+
+    trace_parser = subparsers.add_parser(
+        "trace-report",
+        help="Print per-stage percentiles from a trace written by batch --trace"
+    )
+    trace_parser.add_argument("trace_file", help="JSON-lines trace file")
+    trace_parser.set_defaults(func=run_trace_report_command)
+
+    large_parser = subparsers.add_parser(
+        "large",
+        help="Convert a very large document by splitting it at top-level headings"
+    )
+    large_parser.add_argument("input_file", help="Markdown file to convert")
+    large_parser.add_argument("output_file", help="PDF file to write")
+    large_parser.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help="Number of shards rendered in parallel (default: number of CPU cores)"
+    )
+    large_parser.add_argument(
+        "--shard-size", type=int, default=256,
+        help="Target shard size in KB; sections are grouped up to this size (default: 256)"
+    )
+    large_parser.add_argument(
+        "--no-page-numbers", action="store_true",
+        help="Do not stamp continuous page numbers on the merged PDF"
+    )
+    large_parser.add_argument(
+        "--parser", choices=sorted(BACKENDS), default=None,
+        help="Markdown parser backend (default: markdown2, or $MD_TO_PDF_PARSER)"
+    )
+    large_parser.add_argument(
+        "--highlight", nargs="?", const="default", default=None, metavar="STYLE",
+        help="Syntax-highlight fenced code blocks with this Pygments style (default style: 'default')"
+    )
+    large_parser.add_argument(
+        "--theme", default=None,
+        help="Page theme: CSS, page size, margins, header and footer (default: 'default')"
+    )
+    large_parser.add_argument(
+        "--theme-file", default=None,
+        help="JSON file defining additional themes"
+    )
+    large_parser.add_argument(
+        "--asset-dir", default=None,
+        help="Write the theme's stylesheet and fonts here once and link them instead of inlining"
+    )
+    large_parser.set_defaults(func=run_large_command)
+
+    preview_parser = subparsers.add_parser(
+        "preview",
+        help="Quickly render a low-quality draft of the first pages or one section"
+    )
+    preview_parser.add_argument("input_file", help="Markdown file to preview")
+    preview_parser.add_argument("output_file", help="PDF, or .png for a thumbnail of the first page")
+    preview_parser.add_argument(
+        "--pages", type=int, default=1,
+        help="Render roughly this many pages from the start (default: 1)"
+    )
+    preview_parser.add_argument(
+        "--section", default=None,
+        help="Render only the section under this heading instead"
+    )
+    preview_parser.add_argument(
+        "--parser", choices=sorted(BACKENDS), default=None,
+        help="Markdown parser backend (default: markdown2, or $MD_TO_PDF_PARSER)"
+    )
+    preview_parser.set_defaults(func=run_preview_command)
+
+    book_parser = subparsers.add_parser(
+        "book",
+        help="Convert an ordered list of chapters into one PDF with a single wkhtmltopdf run"
+    )
+    book_parser.add_argument(
+        "manifest",
+        help="Text file listing one markdown file per line, or a directory of chapters"
+    )
+    book_parser.add_argument("output_file", help="PDF file to write")
+    book_parser.add_argument("--toc", action="store_true", help="Insert a generated table of contents")
+    book_parser.add_argument("--no-outline", action="store_true", help="Do not add PDF bookmarks")
+    book_parser.add_argument(
+        "--outline-depth", type=int, default=3,
+        help="Heading levels included in the PDF bookmarks (default: 3)"
+    )
+    book_parser.add_argument("--title", default=None, help="PDF title (default: the manifest name)")
+    book_parser.add_argument(
+        "--parser", choices=sorted(BACKENDS), default=None,
+        help="Markdown parser backend (default: markdown2, or $MD_TO_PDF_PARSER)"
+    )
+    book_parser.set_defaults(func=run_book_command)
+
+    coordinate_parser = subparsers.add_parser(
+        "coordinate",
+        help="Queue a directory in a shared spool directory and report progress of the workers"
+    )
+    coordinate_parser.add_argument("src_dir", help="Directory to search for .md files")
+    coordinate_parser.add_argument("out_dir", help="Directory to write the PDFs to")
+    coordinate_parser.add_argument("spool_dir", help="Spool directory shared with the workers")
+    coordinate_parser.add_argument(
+        "--workers", type=int, default=0,
+        help="Also start this many worker processes on this machine (default: 0)"
+    )
+    coordinate_parser.add_argument(
+        "--lease", type=float, default=60.0,
+        help="Seconds without a heartbeat before a claimed job is retried (default: 60)"
+    )
+    coordinate_parser.add_argument(
+        "--max-attempts", type=int, default=3,
+        help="Attempts per file before it is marked as failed (default: 3)"
+    )
+    coordinate_parser.add_argument(
+        "--interval", type=float, default=2.0,
+        help="Seconds between progress reports (default: 2)"
+    )
+    coordinate_parser.add_argument(
+        "--parser", choices=sorted(BACKENDS), default=None,
+        help="Markdown parser backend for the local workers"
+    )
+    coordinate_parser.add_argument(
+        "--profile", choices=sorted(OUTPUT_PROFILES), default=None,
+        help="Output size profile for the local workers"
+    )
+    coordinate_parser.set_defaults(func=run_coordinate_command)
+
+    worker_parser = subparsers.add_parser(
+        "worker",
+        help="Convert jobs from a spool directory shared with other workers"
+    )
+    worker_parser.add_argument("spool_dir", help="Spool directory written by the coordinate command")
+    worker_parser.add_argument(
+        "--lease", type=float, default=60.0,
+        help="Seconds without a heartbeat before a claimed job is retried (default: 60)"
+    )
+    worker_parser.add_argument(
+        "--poll", type=float, default=1.0,
+        help="Seconds between checks of an empty spool (default: 1)"
+    )
+    worker_parser.add_argument(
+        "--exit-when-idle", action="store_true",
+        help="Exit once no jobs are pending or running instead of waiting for more"
+    )
+    worker_parser.add_argument(
+        "--parser", choices=sorted(BACKENDS), default=None,
+        help="Markdown parser backend (default: markdown2, or $MD_TO_PDF_PARSER)"
+    )
+    worker_parser.add_argument(
+        "--profile", choices=sorted(OUTPUT_PROFILES), default=None,
+        help="Output size profile: image DPI/quality and a PDF optimization pass (requires pypdf)"
+    )
+    worker_parser.set_defaults(func=run_worker_command)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.startup_profile:
+        print_startup_profile()
+        if not args.command:
+            return 0
+
+    if not args.command:
+        parser.print_help()
+        return 2
+
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Output size profiles and the optional PDF optimization pass.
+
+A profile maps a name to extra wkhtmltopdf options (image DPI and JPEG
+quality) and to the post-processing applied to the finished PDF:
+
+    screen   small files for reading on screen; images recompressed
+    print    full-resolution images for printing; lossless optimization only
+    archive  wkhtmltopdf's highest image quality; lossless optimization only
+
+The optimization pass (needs pypdf) compresses page content streams and
+merges identical objects, e.g. a logo or font repeated on every page. With
+image_quality set, it also re-encodes opaque RGB and grayscale images as JPEG
+at that quality (needs Pillow). wkhtmltopdf always embeds subsetted fonts, so
+no profile changes font embedding.
+"""
+import io
+
+from fileutil import require_pypdf
+
+OUTPUT_PROFILES = {
+    'screen': {
+        'options': {'image-dpi': '150', 'image-quality': '75'},
+        'optimize': True,
+        'image_quality': 70,
+    },
+    'print': {
+        'options': {'image-dpi': '300', 'image-quality': '92', 'print-media-type': ''},
+        'optimize': True,
+        'image_quality': None,
+    },
+    'archive': {
+        'options': {'image-dpi': '600', 'image-quality': '100'},
+        'optimize': True,
+        'image_quality': None,
+    },
+}
+
+
+def get_profile(name):
+    """Return the profile registered under name."""
+    try:
+        return OUTPUT_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown output profile '{name}'. Choose one of: {', '.join(sorted(OUTPUT_PROFILES))}")
+
+
+def _recompress_images(page, image_quality):
+    for image in page.images:
+        try:
+            if '/SMask' in image.indirect_reference.get_object():
+                # JPEG has no alpha channel; leave transparent images alone
+                continue
+            if image.image.mode not in ('RGB', 'L'):
+                continue
+            image.replace(image.image, quality=image_quality)
+        except Exception as e:
+            print(f"Error recompressing image {image.name}: {str(e)}")
+
+
+def optimize_pdf(data, image_quality=None):
+    """Return a smaller version of the PDF given as bytes (never a larger one)."""
+    pypdf = require_pypdf("to optimize PDFs")
+    writer = pypdf.PdfWriter(clone_from=pypdf.PdfReader(io.BytesIO(data)))
+    for page in writer.pages:
+        if image_quality:
+            _recompress_images(page, image_quality)
+        page.compress_content_streams()
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    output = io.BytesIO()
+    writer.write(output)
+    optimized = output.getvalue()
+    return optimized if len(optimized) < len(data) else data
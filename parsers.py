@@ -0,0 +1,97 @@
+"""Markdown parser backends.
+
+Every backend turns a markdown string into an HTML fragment. markdown2 is the
+default and matches the original output; markdown-it-py and mistune are
+faster optional alternatives. Use benchmarks/compare_parsers.py to check how
+closely a backend matches markdown2 on your documents before switching.
+"""
+import os
+
+DEFAULT_PARSER = os.environ.get('MD_TO_PDF_PARSER', 'markdown2')
+
+
+class ParserBackend:
+    name = None
+
+    def render(self, content):
+        """Return the HTML fragment for a markdown string."""
+        raise NotImplementedError
+
+
+class Markdown2Backend(ParserBackend):
+    name = 'markdown2'
+
+    def __init__(self, extras=None):
+        from converter import MARKDOWN_EXTRAS
+
+        self.extras = list(extras if extras is not None else MARKDOWN_EXTRAS)
+
+    def render(self, content):
+        # Imported on first render, so cache hits and short CLI runs never load markdown2
+        import markdown2
+
+        # A fresh markdown2.Markdown per call, since instances are not thread-safe
+        return markdown2.markdown(content, extras=self.extras)
+
+
+class MarkdownItBackend(ParserBackend):
+    name = 'markdown-it'
+
+    def __init__(self):
+        try:
+            from markdown_it import MarkdownIt
+        except ImportError:
+            raise RuntimeError(
+                "markdown-it-py is required for the markdown-it parser. Install it with: pip install markdown-it-py"
+            )
+        # CommonMark plus GFM tables, the closest match to markdown2's 'tables' extra
+        self._markdown = MarkdownIt('commonmark').enable('table')
+
+    def render(self, content):
+        return self._markdown.render(content)
+
+
+class MistuneBackend(ParserBackend):
+    name = 'mistune'
+
+    def __init__(self):
+        try:
+            import mistune
+        except ImportError:
+            raise RuntimeError(
+                "mistune is required for the mistune parser. Install it with: pip install mistune"
+            )
+        # escape=False passes raw HTML through, like markdown2
+        self._markdown = mistune.create_markdown(escape=False, plugins=['table'])
+
+    def render(self, content):
+        return self._markdown(content)
+
+
+BACKENDS = {
+    Markdown2Backend.name: Markdown2Backend,
+    MarkdownItBackend.name: MarkdownItBackend,
+    MistuneBackend.name: MistuneBackend,
+}
+
+
+def get_backend(name=None):
+    """Create the parser backend registered under name (default: DEFAULT_PARSER)."""
+    name = name or DEFAULT_PARSER
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown parser '{name}'. Choose one of: {', '.join(sorted(BACKENDS))}")
+    return backend_class()
+
+
+def available_backends():
+    """Names of the backends whose libraries are installed."""
+    names = []
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+        except RuntimeError:
+            continue
+        names.append(name)
+    return names
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from fileutil import atomic_path
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "md_to_pdf", "pdf")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Eviction frees space down to this fraction of max_bytes, so a full cache is not walked on every store
+EVICT_TO = 0.9
+
+
+def cache_key(markdown_bytes, extras, template, options, wkhtmltopdf_version, title="", parser="markdown2",
+              profile=None, images=None, assets=()):
+    """Build a content-addressed key from everything that affects the rendered PDF.
+
+    images holds the image pipeline settings and assets the (path, size,
+    mtime_ns) of every local image the document references, so replacing an
+    image or changing the DPI is a miss.
+    """
+    digest = hashlib.sha256()
+    digest.update(markdown_bytes)
+    settings = {
+        'parser': parser,
+        'profile': profile,
+        'extras': list(extras),
+        'template': template,
+        'options': options,
+        'wkhtmltopdf': wkhtmltopdf_version,
+        'title': title,
+        'images': images,
+        'assets': [list(asset) for asset in assets],
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PdfCache:
+    """On-disk cache of rendered PDFs with a size cap and LRU eviction.
+
+    Entries are stored as <cache_dir>/<key[:2]>/<key>.pdf. The file mtime is
+    bumped on every hit, so evicting the oldest mtimes first gives LRU order
+    that is shared between processes using the same directory. A hit
+    hard-links the entry into place, so every writer of output PDFs must
+    publish them with os.replace (fileutil.atomic_path) rather than writing
+    into an existing file.
+
+    The cache size is scanned once, on the first store, and then tracked as a
+    running total; the tree is only walked again when that total goes over
+    max_bytes. Other processes' stores are picked up by that walk, so a shared
+    cache can briefly exceed max_bytes by what they added in the meantime.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Bytes in the cache as far as this instance knows; None until first scanned
+        self._total = None
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".pdf")
+
+    def fetch(self, key, output_file):
+        """Place the cached PDF for key at output_file. Returns False on a miss."""
+        entry = self._entry_path(key)
+        if not os.path.isfile(entry):
+            self.misses += 1
+            return False
+
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            with atomic_path(output_file) as temp_path:
+                try:
+                    # A hard link is instant; fall back to copying across filesystems
+                    os.link(entry, temp_path)
+                except OSError:
+                    shutil.copyfile(entry, temp_path)
+        except FileNotFoundError:
+            # Evicted by another process between the check and the link
+            self.misses += 1
+            return False
+
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        self.hits += 1
+        return True
+
+    def store(self, key, pdf_file):
+        """Copy a freshly rendered PDF into the cache, then enforce the size cap."""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        try:
+            replaced = os.path.getsize(entry)
+        except OSError:
+            replaced = 0
+        with atomic_path(entry) as temp_path:
+            shutil.copyfile(pdf_file, temp_path)
+            added = os.path.getsize(temp_path)
+
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan()[1]
+            else:
+                self._total += added - replaced
+            over = self._total > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan(self):
+        """Walk the cache; returns ([(mtime, size, path), ...], total_bytes)."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".pdf"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        """Remove least recently used entries once the cache is over max_bytes."""
+        entries, total = self._scan()
+        if total <= self.max_bytes:
+            with self._lock:
+                self._total = total
+            return 0
+
+        target = self.max_bytes * EVICT_TO
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._total = total
+        return removed
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
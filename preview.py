@@ -0,0 +1,100 @@
+"""Draft/preview rendering: pick the part of a document worth rendering quickly.
+
+MarkdownConverter.preview renders either one heading's section or roughly the
+first N pages with low-quality wkhtmltopdf settings. The helpers here select
+that markdown without parsing the whole document.
+"""
+import io
+import re
+
+from incremental_html import DEFINITION_RE, FENCE_RE, split_blocks
+
+# Rough amount of markdown source that fills one A4 page with the default CSS
+CHARS_PER_PAGE = 3000
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+
+PREVIEW_PDF_OPTIONS = {
+    'lowquality': '',
+    'image-dpi': '96',
+    'image-quality': '60',
+    'no-outline': '',
+    'disable-javascript': '',
+}
+
+# Thumbnail size in pixels; the height is one A4 page at this width
+THUMBNAIL_WIDTH = 800
+THUMBNAIL_HEIGHT = int(THUMBNAIL_WIDTH * 297 / 210)
+
+
+def extract_section(content, heading):
+    """Return the markdown of the section under heading, or None if there is none.
+
+    The heading is matched case-insensitively at any level; the section runs
+    until the next heading of the same or a higher level. Link definitions from
+    the whole document are kept so reference-style links still resolve.
+    """
+    wanted = heading.strip().lower()
+    section = []
+    definitions = []
+    level = None
+    fence = None
+
+    for line in content.splitlines():
+        if fence is None and DEFINITION_RE.match(line):
+            definitions.append(line)
+            continue
+
+        match = HEADING_RE.match(line) if fence is None else None
+        if match:
+            if level is not None and len(match.group(1)) <= level:
+                level = -1
+            elif level is None and match.group(2).strip().lower() == wanted:
+                level = len(match.group(1))
+
+        if level is not None and level > 0:
+            section.append(line)
+
+        stripped = line.strip()
+        if fence is not None:
+            if stripped.startswith(fence):
+                fence = None
+        else:
+            fence_match = FENCE_RE.match(line)
+            if fence_match:
+                fence = fence_match.group(1)
+
+    if not section:
+        return None
+    return '\n'.join(section + [''] + definitions)
+
+
+def leading_blocks(content, pages):
+    """Return roughly the first pages pages of markdown, cut at a block boundary."""
+    budget = pages * CHARS_PER_PAGE
+    blocks, definitions = split_blocks(content)
+    selected = []
+    size = 0
+    for block in blocks:
+        if selected and size + len(block) > budget:
+            break
+        selected.append(block)
+        size += len(block)
+    return '\n\n'.join(selected + definitions)
+
+
+def trim_pages(pdf, pages):
+    """Keep only the first pages pages of a PDF given as bytes; needs pypdf, else unchanged."""
+    try:
+        import pypdf
+    except ImportError:
+        return pdf
+    reader = pypdf.PdfReader(io.BytesIO(pdf))
+    if len(reader.pages) <= pages:
+        return pdf
+    writer = pypdf.PdfWriter()
+    for page in reader.pages[:pages]:
+        writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -0,0 +1,72 @@
+"""Thread-safe progress channel between conversion threads and the Tk UI.
+
+Worker threads never touch Tk widgets. They post status and progress to a
+ProgressChannel, and the Tk main loop drains it with root.after at a capped
+frame rate. Updates are coalesced per key: if a job reports ten steps between
+two frames, only the latest message and progress are drawn. Callables queued
+with call() are never coalesced and run on the Tk thread in order.
+"""
+import queue
+import threading
+
+DEFAULT_FPS = 20
+
+
+class ProgressChannel:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}   # key -> {'message': ..., 'progress': ...}, latest values only
+        self._calls = queue.Queue()
+        self.posted = 0
+        self.delivered = 0
+
+    def post(self, message=None, progress=None, key=None):
+        """Record the latest status of key; safe to call from any thread."""
+        with self._lock:
+            state = self._latest.setdefault(key, {})
+            if message is not None:
+                state['message'] = message
+            if progress is not None:
+                state['progress'] = progress
+            self.posted += 1
+
+    def call(self, func, *args):
+        """Run func(*args) on the UI thread at the next frame."""
+        self._calls.put((func, args))
+
+    def drain(self):
+        """Return ({key: state}, [(func, args), ...]) accumulated since the last drain."""
+        with self._lock:
+            latest, self._latest = self._latest, {}
+            self.delivered += len(latest)
+        calls = []
+        while True:
+            try:
+                calls.append(self._calls.get_nowait())
+            except queue.Empty:
+                break
+        return latest, calls
+
+    def pump(self, root, apply_update, fps=DEFAULT_FPS):
+        """Drain the channel from root's event loop at most fps times per second.
+
+        apply_update(key, state) is called on the Tk thread for every key that
+        changed since the previous frame.
+        """
+        interval = max(1, int(1000 / fps))
+
+        def poll():
+            latest, calls = self.drain()
+            for key, state in latest.items():
+                try:
+                    apply_update(key, state)
+                except Exception as e:
+                    print(f"Error updating progress: {str(e)}")
+            for func, args in calls:
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"Error in UI callback: {str(e)}")
+            root.after(interval, poll)
+
+        root.after(interval, poll)
@@ -1,3 +1,4 @@
+import importlib.util
 import time
 
 
@@ -7,10 +8,10 @@ def check_and_install_dependencies():
     missing_packages = []
 
     for package in required_packages:
-        try:
-            __import__(package)
+        # find_spec only locates the package, it does not pay for importing it
+        if importlib.util.find_spec(package) is not None:
             print(f"✓ {package} is already installed")
-        except ImportError:
+        else:
             missing_packages.append(package)
 
     if missing_packages:
@@ -0,0 +1,347 @@
+"""Local HTTP conversion service built on the standard library.
+
+Endpoints:
+    POST /convert[?title=name][&async=1]   markdown body -> PDF (200) or job id (202)
+    GET  /jobs/<id>                        job status as JSON
+    GET  /jobs/<id>/pdf                    the finished PDF
+    GET  /health, /metrics                 queue depth, in-flight jobs, latency histograms
+
+Requests go through a bounded job queue served by a fixed pool of worker
+threads, each running its own wkhtmltopdf process per job. When the queue is
+full the server answers 429, and 503 when it cannot convert at all.
+"""
+import json
+import queue
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from converter import MarkdownConverter
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 32
+# Documents larger than this are converted asynchronously and get a job id
+DEFAULT_SYNC_LIMIT = 256 * 1024
+DEFAULT_MAX_REQUEST_BYTES = 32 * 1024 * 1024
+DEFAULT_SYNC_TIMEOUT = 120
+DEFAULT_MAX_FINISHED_JOBS = 1000
+# Finished PDFs are held in memory until fetched; older ones are dropped past this
+DEFAULT_MAX_FINISHED_BYTES = 256 * 1024 * 1024
+
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.count += 1
+
+    def to_dict(self):
+        labels = [f"le_{bound}" for bound in self.buckets] + ["le_inf"]
+        return {
+            'count': self.count,
+            'sum_s': self.total,
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class Job:
+    def __init__(self, markdown, title):
+        self.id = uuid.uuid4().hex
+        self.markdown = markdown
+        self.title = title
+        self.status = 'queued'
+        self.pdf = None
+        self.error = None
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        info = {'id': self.id, 'status': self.status, 'title': self.title}
+        if self.error:
+            info['error'] = self.error
+        if self.finished is not None:
+            info['latency_s'] = self.finished - self.created
+        return info
+
+
+class ConversionService:
+    """Bounded job queue plus worker threads that turn markdown into PDF bytes."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS, max_finished_bytes=DEFAULT_MAX_FINISHED_BYTES,
+                 converter_factory=None):
+        self.converter_factory = converter_factory or MarkdownConverter
+        self.workers = workers
+        self.max_finished_jobs = max_finished_jobs
+        self.max_finished_bytes = max_finished_bytes
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._jobs = {}
+        self._finished_order = []
+        self._finished_bytes = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = False
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_latency = LatencyHistogram()
+        self.render_latency = LatencyHistogram()
+        self.total_latency = LatencyHistogram()
+
+    def start(self):
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"converter-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._running = False
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    @property
+    def accepting(self):
+        return self._running
+
+    def submit(self, markdown, title):
+        """Queue a job, or return None if the queue is full."""
+        job = Job(markdown, title)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+                self.rejected += 1
+            return None
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _worker(self):
+        # One converter per worker thread; it keeps per-conversion state
+        converter = self.converter_factory()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            job.started = time.monotonic()
+            job.status = 'running'
+            with self._lock:
+                self.in_flight += 1
+            try:
+                job.pdf = converter.convert_bytes(job.markdown, title=job.title)
+                job.status = 'done'
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)
+            finally:
+                job.markdown = None
+                job.finished = time.monotonic()
+                with self._lock:
+                    self.in_flight -= 1
+                    if job.status == 'done':
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    self.queue_latency.observe(job.started - job.created)
+                    self.render_latency.observe(job.finished - job.started)
+                    self.total_latency.observe(job.finished - job.created)
+                    self._remember_finished(job)
+                job.done.set()
+
+    def _remember_finished(self, job):
+        # Finished jobs are kept so their PDFs can be fetched, oldest dropped first;
+        # the newest job is always kept, even if its PDF alone is over the byte limit
+        self._finished_order.append(job.id)
+        self._finished_bytes += len(job.pdf or b'')
+        while len(self._finished_order) > 1 and (len(self._finished_order) > self.max_finished_jobs or
+                                                 self._finished_bytes > self.max_finished_bytes):
+            dropped = self._jobs.pop(self._finished_order.pop(0), None)
+            if dropped is not None:
+                self._finished_bytes -= len(dropped.pdf or b'')
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'status': 'ok' if self._running else 'stopped',
+                'workers': self.workers,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'finished_jobs': len(self._finished_order),
+                'finished_bytes': self._finished_bytes,
+                'latency': {
+                    'queue': self.queue_latency.to_dict(),
+                    'render': self.render_latency.to_dict(),
+                    'total': self.total_latency.to_dict(),
+                },
+            }
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    server_version = "md_to_pdf"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_pdf(self, job):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(job.pdf)))
+        self.send_header('Content-Disposition', f'inline; filename="{job.title}.pdf"')
+        self.end_headers()
+        self.wfile.write(job.pdf)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        if path in ('/health', '/metrics'):
+            self._send_json(200, self.service.metrics())
+            return
+
+        parts = path.split('/')
+        if len(parts) in (3, 4) and parts[1] == 'jobs':
+            job = self.service.get(parts[2])
+            if job is None:
+                self._send_json(404, {'error': 'unknown job'})
+            elif len(parts) == 3:
+                self._send_json(200, job.to_dict())
+            elif parts[3] != 'pdf':
+                self._send_json(404, {'error': 'not found'})
+            elif job.status == 'done':
+                self._send_pdf(job)
+            elif job.status == 'failed':
+                self._send_json(500, job.to_dict())
+            else:
+                self._send_json(202, job.to_dict(), {'Retry-After': '1'})
+            return
+
+        self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/convert':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        if not self.service.accepting:
+            self._send_json(503, {'error': 'service unavailable'}, {'Retry-After': '5'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self._send_json(411, {'error': 'Content-Length required'})
+            return
+        if length < 0:
+            # rfile.read(-1) would block until the client closes the connection
+            self._send_json(400, {'error': 'invalid Content-Length'})
+            return
+        if length > self.server.max_request_bytes:
+            self._send_json(413, {'error': 'request too large'})
+            return
+
+        markdown = self.rfile.read(length)
+        query = parse_qs(url.query)
+        # The title ends up in a response header, so keep it to safe characters
+        title = re.sub(r'[^\w.\- ]', '_', query.get('title', ['document'])[0])[:100] or 'document'
+        run_async = query.get('async', ['0'])[0] == '1' or length > self.server.sync_limit
+
+        job = self.service.submit(markdown, title)
+        if job is None:
+            self._send_json(429, {'error': 'queue full'}, {'Retry-After': '1'})
+            return
+
+        if run_async:
+            self._send_json(202, job.to_dict(), {'Location': f'/jobs/{job.id}'})
+            return
+
+        if not job.done.wait(self.server.sync_timeout):
+            # Still converting; the caller can pick the result up later
+            self._send_json(503, job.to_dict(), {'Location': f'/jobs/{job.id}', 'Retry-After': '5'})
+        elif job.status == 'done':
+            self._send_pdf(job)
+        else:
+            self._send_json(500, job.to_dict())
+
+
+class ConversionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, sync_limit=DEFAULT_SYNC_LIMIT,
+                 max_request_bytes=DEFAULT_MAX_REQUEST_BYTES, sync_timeout=DEFAULT_SYNC_TIMEOUT,
+                 verbose=True):
+        super().__init__(address, ConversionRequestHandler)
+        self.service = service
+        self.sync_limit = sync_limit
+        self.max_request_bytes = max_request_bytes
+        self.sync_timeout = sync_timeout
+        self.verbose = verbose
+
+
+def serve(host='127.0.0.1', port=8000, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+          sync_limit=DEFAULT_SYNC_LIMIT, theme=None, theme_file=None, asset_dir=None):
+    """Run the conversion service until interrupted."""
+    def converter_factory():
+        # The theme is compiled once and shared by every worker's converter
+        return MarkdownConverter(theme=theme, theme_file=theme_file, asset_dir=asset_dir)
+
+    # Fail fast rather than accepting jobs that can never be converted
+    converter_factory().check_dependencies()
+    service = ConversionService(workers=workers, queue_size=queue_size, converter_factory=converter_factory)
+    service.start()
+    server = ConversionServer((host, port), service, sync_limit=sync_limit)
+    print(f"Serving on http://{host}:{server.server_address[1]} with {workers} workers (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping server")
+    finally:
+        server.server_close()
+        service.stop()
@@ -0,0 +1,308 @@
+"""Distributed batch conversion over a shared spool directory.
+
+Any number of workers, on one machine or on several nodes mounting the same
+filesystem, take jobs from a spool directory:
+
+    pending/<job>.json            waiting to be converted
+    claimed/<job>.<worker>.json   being converted; its mtime is the lease heartbeat
+    done/<job>.json               finished, with the worker and duration
+    failed/<job>.json             gave up after max_attempts
+
+A worker claims a job by renaming it from pending/ to claimed/; rename is
+atomic, so exactly one worker wins. While converting, the worker touches its
+claim file; a claim whose mtime is older than the lease is taken back and
+queued again, so jobs of crashed workers are retried. To finish a job, the
+worker first renames its claim to <claim>.finishing: if that fails, its lease
+was taken back and the result is dropped, so a job is never both done and
+pending. PDFs are written to a temporary name next to the output and
+published with os.replace, so readers never see a partial file. Paths in jobs
+are absolute and must be the same on every node.
+"""
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from batch import find_markdown_files, output_path_for
+from fileutil import write_atomic
+
+PENDING = 'pending'
+CLAIMED = 'claimed'
+DONE = 'done'
+FAILED = 'failed'
+
+DEFAULT_LEASE = 60.0
+DEFAULT_POLL = 1.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def _write_json(path, data):
+    write_atomic(path, json.dumps(data))
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def job_id_for(input_file):
+    return hashlib.sha1(os.path.abspath(input_file).encode('utf-8')).hexdigest()
+
+
+class SpoolQueue:
+    """The job directories of a spool and the atomic moves between them."""
+
+    def __init__(self, spool_dir, lease=DEFAULT_LEASE):
+        self.spool_dir = spool_dir
+        self.lease = lease
+        for state in (PENDING, CLAIMED, DONE, FAILED):
+            os.makedirs(self._dir(state), exist_ok=True)
+
+    def _dir(self, state):
+        return os.path.join(self.spool_dir, state)
+
+    def _names(self, state):
+        if state == CLAIMED:
+            # Claims being finished or recovered are still running
+            return sorted(os.listdir(self._dir(state)))
+        return sorted(name for name in os.listdir(self._dir(state)) if name.endswith('.json'))
+
+    def enqueue(self, input_file, output_file, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Queue a job unless it is already pending or claimed; returns True if queued."""
+        job_id = job_id_for(input_file)
+        if os.path.exists(os.path.join(self._dir(PENDING), f"{job_id}.json")):
+            return False
+        if any(name.startswith(f"{job_id}.") for name in self._names(CLAIMED)):
+            return False
+        for state in (DONE, FAILED):
+            try:
+                os.remove(os.path.join(self._dir(state), f"{job_id}.json"))
+            except FileNotFoundError:
+                pass
+        _write_json(os.path.join(self._dir(PENDING), f"{job_id}.json"), {
+            'id': job_id,
+            'input': os.path.abspath(input_file),
+            'output': os.path.abspath(output_file),
+            'attempts': 0,
+            'max_attempts': max_attempts,
+        })
+        return True
+
+    def claim(self, worker_id):
+        """Atomically take the next pending job; returns (job, claim_path) or None."""
+        for name in self._names(PENDING):
+            source = os.path.join(self._dir(PENDING), name)
+            claim_path = os.path.join(self._dir(CLAIMED), f"{name[:-5]}.{worker_id}.json")
+            try:
+                # The rename keeps the mtime, so start the lease before it; otherwise a
+                # job that waited longer than the lease would look expired once claimed
+                os.utime(source)
+                os.rename(source, claim_path)
+            except FileNotFoundError:
+                # Another worker was faster
+                continue
+            return _read_json(claim_path), claim_path
+        return None
+
+    def heartbeat(self, claim_path):
+        os.utime(claim_path)
+
+    def _take(self, claim_path):
+        """Atomically take a claim back from the lease; returns None if it was recovered."""
+        taken = f"{claim_path}.finishing"
+        try:
+            os.rename(claim_path, taken)
+        except FileNotFoundError:
+            return None
+        return taken
+
+    def complete(self, job, claim_path, result, publish=None):
+        """Record a finished job, calling publish() first; returns False if the lease was lost."""
+        taken = self._take(claim_path)
+        if taken is None:
+            return False
+        if publish is not None:
+            publish()
+        job = {key: value for key, value in job.items() if key != 'error'}
+        _write_json(os.path.join(self._dir(DONE), f"{job['id']}.json"), dict(job, **result))
+        os.remove(taken)
+        return True
+
+    def fail(self, job, claim_path, error):
+        """Queue the job again, or move it to failed/ once it ran out of attempts.
+
+        Returns False if the lease was lost, in which case the job was already queued again.
+        """
+        taken = self._take(claim_path)
+        if taken is None:
+            return False
+        job = dict(job, attempts=job['attempts'] + 1, error=error)
+        state = FAILED if job['attempts'] >= job['max_attempts'] else PENDING
+        _write_json(os.path.join(self._dir(state), f"{job['id']}.json"), job)
+        os.remove(taken)
+        return True
+
+    def recover_expired(self, recovered_by):
+        """Take back claims whose lease expired; returns the number of jobs queued again."""
+        recovered = 0
+        now = time.time()
+        for name in self._names(CLAIMED):
+            claim_path = os.path.join(self._dir(CLAIMED), name)
+            try:
+                if now - os.path.getmtime(claim_path) < self.lease:
+                    continue
+                # Rename first, so only one process recovers the job
+                taken = f"{claim_path}.recovering-{recovered_by}"
+                os.rename(claim_path, taken)
+            except FileNotFoundError:
+                continue
+            job = _read_json(taken)
+            print(f"Lease expired for {job['input']} ({name}), queueing it again")
+            self.fail(job, taken, "lease expired")
+            recovered += 1
+        return recovered
+
+    def counts(self):
+        return {state: len(self._names(state)) for state in (PENDING, CLAIMED, DONE, FAILED)}
+
+    def results(self, state):
+        return [_read_json(os.path.join(self._dir(state), name)) for name in self._names(state)]
+
+
+class SpoolWorker:
+    """Claim jobs from a spool and convert them with one MarkdownConverter."""
+
+    def __init__(self, spool_dir, lease=DEFAULT_LEASE, poll=DEFAULT_POLL, converter=None, worker_id=None):
+        from converter import MarkdownConverter
+
+        self.queue = SpoolQueue(spool_dir, lease=lease)
+        self.poll = poll
+        self.converter = converter or MarkdownConverter()
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.converted = 0
+        self.failed = 0
+        self._stop = threading.Event()
+
+    def _keep_lease(self, claim_path, finished):
+        while not finished.wait(self.queue.lease / 3):
+            try:
+                self.queue.heartbeat(claim_path)
+            except FileNotFoundError:
+                return
+
+    def run_job(self, job, claim_path):
+        output_file = job['output']
+        temp_output = f"{output_file}.{self.worker_id}.tmp.pdf"
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._keep_lease, args=(claim_path, finished), daemon=True)
+        heartbeat.start()
+        start = time.perf_counter()
+        try:
+            try:
+                success = self.converter.convert(job['input'], temp_output)
+            finally:
+                finished.set()
+                heartbeat.join()
+            duration = time.perf_counter() - start
+
+            if success:
+                # Publish atomically: readers see the old PDF or the new one, never a partial file
+                kept = self.queue.complete(job, claim_path, {'worker': self.worker_id, 'duration': duration},
+                                           publish=lambda: os.replace(temp_output, output_file))
+                if kept:
+                    self.converted += 1
+                    print(f"OK     {job['input']} ({duration:.2f}s)")
+            else:
+                error = self.converter.last_error or "conversion failed"
+                kept = self.queue.fail(job, claim_path, error)
+                if kept:
+                    self.failed += 1
+                    print(f"FAILED {job['input']}: {error}")
+            if not kept:
+                print(f"LOST   {job['input']}: lease expired during the conversion, result dropped")
+        finally:
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
+
+    def run(self, exit_when_idle=False):
+        """Convert jobs until stop() is called, or until the spool is empty with exit_when_idle."""
+        print(f"Worker {self.worker_id} watching {self.queue.spool_dir}")
+        try:
+            while not self._stop.is_set():
+                self.queue.recover_expired(self.worker_id)
+                claimed = self.queue.claim(self.worker_id)
+                if claimed is not None:
+                    try:
+                        self.run_job(*claimed)
+                    except OSError as e:
+                        # A spool hiccup must not take the worker down; the lease retries the job
+                        print(f"Error running {claimed[0]['input']}: {str(e)}")
+                    continue
+                if exit_when_idle:
+                    counts = self.queue.counts()
+                    if not counts[PENDING] and not counts[CLAIMED]:
+                        break
+                self._stop.wait(self.poll)
+        except KeyboardInterrupt:
+            print("Stopping worker")
+        print(f"Worker {self.worker_id}: {self.converted} converted, {self.failed} failed")
+
+    def stop(self):
+        self._stop.set()
+
+
+def run_coordinator(src_dir, out_dir, spool_dir, local_workers=0, lease=DEFAULT_LEASE,
+                    max_attempts=DEFAULT_MAX_ATTEMPTS, interval=2.0, worker_args=()):
+    """Queue every markdown file below src_dir and report progress until the spool drains.
+
+    With local_workers, that many worker processes are started on this machine.
+    Returns (done, failed) job results.
+    """
+    queue = SpoolQueue(spool_dir, lease=lease)
+    queued = 0
+    for input_file in find_markdown_files(src_dir):
+        output_file = output_path_for(input_file, src_dir, out_dir)
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        if queue.enqueue(input_file, output_file, max_attempts=max_attempts):
+            queued += 1
+    print(f"Queued {queued} jobs in {spool_dir}")
+
+    workers = []
+    for _ in range(local_workers):
+        command = [sys.executable, '-m', 'md_to_pdf', 'worker', os.path.abspath(spool_dir), '--lease', str(lease),
+                   '--exit-when-idle'] + list(worker_args)
+        workers.append(subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                                        cwd=os.path.dirname(os.path.abspath(__file__))))
+
+    start = time.perf_counter()
+    done_at_start = queue.counts()[DONE]
+    try:
+        while True:
+            queue.recover_expired('coordinator')
+            counts = queue.counts()
+            elapsed = time.perf_counter() - start
+            finished = counts[DONE] - done_at_start
+            rate = finished / elapsed if elapsed else 0.0
+            print(f"[{elapsed:7.1f}s] pending {counts[PENDING]}, running {counts[CLAIMED]}, "
+                  f"done {counts[DONE]}, failed {counts[FAILED]} ({rate:.2f} files/s)")
+            if not counts[PENDING] and not counts[CLAIMED]:
+                break
+            time.sleep(interval)
+    finally:
+        for worker in workers:
+            worker.wait()
+
+    done = queue.results(DONE)
+    failed = queue.results(FAILED)
+    elapsed = time.perf_counter() - start
+    busy = sum(result['duration'] for result in done)
+    nodes = sorted({result['worker'] for result in done})
+    print(f"Converted {len(done)} files in {elapsed:.2f}s ({len(done) / elapsed if elapsed else 0:.2f} files/s, "
+          f"{busy:.1f}s of conversion time across {len(nodes)} workers), {len(failed)} failed")
+    for result in failed:
+        print(f"  FAILED {result['input']}: {result.get('error')}")
+    return done, failed
@@ -0,0 +1,49 @@
+"""IncrementalRenderer must produce the same HTML as a full markdown2 render.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import markdown2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converter import MARKDOWN_EXTRAS
+from incremental_html import IncrementalRenderer, split_blocks
+
+DOCUMENTS = {
+    'definition_title_on_next_line': 'See [a][].\n\n[a]: http://a.com\n  "Title"\n\nAfter.\n',
+    'definition_url_on_next_line': 'See [b][].\n\n[b]:\n  http://b.com\n  (Title)\n\nAfter.\n',
+    'definition_then_paragraph': 'See [a][].\n\n[a]: http://a.com\nNot a title.\n',
+    'nested_same_tag': 'Before.\n\n<div>\n<div>x</div>\n\ninner\n\n</div>\n\nAfter.\n',
+    'sibling_html_blocks': '<div>one</div>\n\ntext\n\n<div>\ntwo\n\n</div>\n\nAfter.\n',
+    'comment_with_blank_lines': 'Before.\n\n<!-- start\n\nhidden\n\nend -->\n\nAfter.\n',
+    'one_line_comment': 'Before.\n\n<!-- note -->\n\nAfter.\n',
+    'fence_with_blank_lines': '# Code\n\n```python\nx = 1\n\n\ny = 2\n```\n\nAfter.\n',
+    'loose_list': '- one\n\n- two\n\n    continued\n\nAfter.\n',
+}
+
+
+@pytest.mark.parametrize('name', sorted(DOCUMENTS))
+def test_matches_full_render(name):
+    content = DOCUMENTS[name]
+    expected = markdown2.markdown(content, extras=MARKDOWN_EXTRAS)
+    assert IncrementalRenderer(MARKDOWN_EXTRAS).render(content) == expected
+
+
+def test_rerender_after_edit_matches_full_render():
+    renderer = IncrementalRenderer(MARKDOWN_EXTRAS)
+    content = DOCUMENTS['nested_same_tag'] + '\n' + DOCUMENTS['definition_title_on_next_line']
+    renderer.render(content)
+    edited = content.replace('inner', 'changed')
+    assert renderer.render(edited) == markdown2.markdown(edited, extras=MARKDOWN_EXTRAS)
+    assert renderer.hits
+
+
+def test_definition_keeps_its_title_line():
+    blocks, definitions = split_blocks(DOCUMENTS['definition_title_on_next_line'])
+    assert definitions == ['[a]: http://a.com\n  "Title"']
+    assert blocks == ['See [a][].', 'After.']
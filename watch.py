@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batch import find_markdown_files, output_path_for
+from converter import MarkdownConverter
+from fileutil import file_digest
+
+
+class DirectoryWatcher:
+    """Poll a directory of markdown files and rebuild PDFs as they change.
+
+    Changes are detected by (mtime, size). A file is rebuilt once it has been
+    quiet for `debounce` seconds, so a burst of editor saves becomes a single
+    render, and only if its content hash differs from the last build. A file
+    that changes while it is rendering is queued again instead of rendering
+    twice in parallel.
+    """
+
+    def __init__(self, src_dir, out_dir, interval=0.5, debounce=0.3, jobs=2, converter_factory=None):
+        self.src_dir = src_dir
+        self.out_dir = out_dir
+        self.interval = interval
+        self.debounce = debounce
+        self.jobs = jobs
+        # Watch mode re-renders the same documents repeatedly, so memoize HTML blocks
+        self.converter_factory = converter_factory or (lambda: MarkdownConverter(incremental=True))
+
+        self._stats = {}        # path -> (mtime, size) last seen
+        self._built = {}        # path -> content hash of the last successful build
+        self._pending = {}      # path -> time the latest change was seen
+        self._in_flight = set()
+        self._dirty = set()     # changed again while rendering
+        self._initial = set()   # stale at startup, so edit-to-PDF latency is meaningless
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=jobs)
+
+    def _converter(self):
+        # MarkdownConverter keeps per-conversion state, so use one per thread
+        if not hasattr(self._local, 'converter'):
+            self._local.converter = self.converter_factory()
+        return self._local.converter
+
+    def _needs_initial_build(self, path):
+        output_file = output_path_for(path, self.src_dir, self.out_dir)
+        try:
+            return os.path.getmtime(output_file) < os.path.getmtime(path)
+        except OSError:
+            return True
+
+    def scan(self, initial=False):
+        """Poll the source tree once and record changed or removed files."""
+        now = time.monotonic()
+        seen = set()
+        for path in find_markdown_files(self.src_dir):
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            previous = self._stats.get(path)
+            self._stats[path] = signature
+
+            if previous is None and initial:
+                if not self._needs_initial_build(path):
+                    continue
+                self._initial.add(path)
+            if previous != signature:
+                with self._lock:
+                    self._pending[path] = now
+
+        for path in set(self._stats) - seen:
+            del self._stats[path]
+            self._built.pop(path, None)
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def dispatch(self):
+        """Start rebuilds for files that have been quiet for the debounce period."""
+        now = time.monotonic()
+        with self._lock:
+            due = [path for path, changed in self._pending.items() if now - changed >= self.debounce]
+            for path in due:
+                del self._pending[path]
+                if path in self._in_flight:
+                    self._dirty.add(path)
+                    continue
+                self._in_flight.add(path)
+                self._pool.submit(self._rebuild, path)
+
+    def _rebuild(self, path):
+        try:
+            try:
+                digest = file_digest(path)
+            except OSError:
+                return
+            if self._built.get(path) == digest:
+                return
+
+            output_file = output_path_for(path, self.src_dir, self.out_dir)
+            start = time.perf_counter()
+            success = self._converter().convert(path, output_file)
+            duration = time.perf_counter() - start
+
+            if success:
+                self._built[path] = digest
+                if path in self._initial:
+                    self._initial.discard(path)
+                    print(f"Built {path} in {duration:.2f}s")
+                else:
+                    # Latency from the last save of the source to the finished PDF
+                    latency = time.time() - os.path.getmtime(path)
+                    print(f"Rebuilt {path} in {duration:.2f}s (edit-to-PDF {latency:.2f}s)")
+            else:
+                print(f"FAILED {path} after {duration:.2f}s: {self._converter().last_error}")
+        except Exception as e:
+            print(f"FAILED {path}: {str(e)}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(path)
+                if path in self._dirty:
+                    # Saved again mid-render: rebuild right away with the new content
+                    self._dirty.discard(path)
+                    self._pending[path] = time.monotonic() - self.debounce
+
+    def run(self):
+        """Watch until stop() is called or the process is interrupted."""
+        print(f"Watching {self.src_dir} for changes (Ctrl+C to stop)...")
+        self.scan(initial=True)
+        try:
+            while not self._stop.is_set():
+                self.dispatch()
+                self._stop.wait(min(self.interval, self.debounce))
+                self.scan()
+        except KeyboardInterrupt:
+            print("Stopping watch mode")
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def stop(self):
+        self._stop.set()